@@ -0,0 +1,65 @@
+def build_agent(cfg):
+    # keep the default endpoint of each backend unless one is configured
+    endpoint = {"base_url": cfg.agent.base_url} if cfg.agent.base_url else {}
+    if cfg.agent.model_name.lower().startswith("mock__"):
+        from agents.mock import MockAgent
+        agent = MockAgent(
+            cfg,
+            mode=cfg.agent.model_name.split("__")[1],
+            max_tokens=cfg.agent.max_tokens
+        )
+    elif "ollama" in cfg.agent.model_name.lower():
+        from agents.ollama_models import OllamaModel
+        model_name = cfg.agent.model_name.split("__")[1]
+        agent = OllamaModel(
+            model_name=model_name,
+            max_tokens=cfg.agent.max_tokens,
+            timeout=cfg.agent.timeout,
+            pool_size=cfg.agent.pool_size,
+            **endpoint
+        )
+    elif "qwen" in cfg.agent.model_name.lower():
+        from agents.qwenvl import QwenVL
+        agent = QwenVL(
+            model_name=cfg.agent.model_name,
+            api_key=cfg.agent.api_key,
+            max_tokens=cfg.agent.max_tokens,
+            timeout=cfg.agent.timeout,
+            pool_size=cfg.agent.pool_size,
+            http2=cfg.agent.http2,
+            **endpoint
+        )
+    elif "gpt" in cfg.agent.model_name.lower():
+        from agents.gpt import GPTs
+        agent = GPTs(
+            model_name=cfg.agent.model_name,
+            api_key=cfg.agent.api_key,
+            max_tokens=cfg.agent.max_tokens,
+            timeout=cfg.agent.timeout,
+            pool_size=cfg.agent.pool_size,
+            http2=cfg.agent.http2,
+            **endpoint
+        )
+    else:
+        raise NotImplementedError(
+            f"Model {cfg.agent.model_name} is not supported yet."
+        )
+
+    agent.max_retries = cfg.agent.max_retries
+    agent.concurrency = cfg.agent.concurrency
+    if cfg.agent.image.max_side or cfg.agent.image.format:
+        agent.image_policy = (
+            cfg.agent.image.max_side,
+            cfg.agent.image.format,
+            cfg.agent.image.quality
+        )
+
+    if cfg.agent.cache.enabled:
+        from agents.base import CachedAgent
+        from tools.response_cache import ResponseCache
+        agent = CachedAgent(
+            agent,
+            ResponseCache(cfg.agent.cache.path),
+            bypass=cfg.agent.cache.bypass
+        )
+    return agent
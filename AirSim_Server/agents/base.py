@@ -0,0 +1,212 @@
+import abc
+import asyncio
+import random
+import time
+import uuid
+
+import requests
+from openai import APIConnectionError, APIStatusError
+
+from tools.frame_store import frame_store
+from tools.utils import JsonStreamParser
+
+# status codes worth retrying: rate limited, overloaded or temporarily down
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+# sent with every request so that a shared server (e.g. agents/mock_server.py)
+# can tell the episodes of different contexts apart
+SESSION_HEADER = "X-Session-Id"
+
+
+def retry_after(error: Exception) -> float:
+    """Delay requested by the server in a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after", None))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APIConnectionError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRY_STATUS
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRY_STATUS
+    return False
+
+
+class BaseAgent(abc.ABC):
+    """Retried, async and batched calls on top of the blocking ``call`` of a backend.
+
+    ``__call__`` retries rate-limited and transient failures of ``call`` with
+    exponential backoff (honouring Retry-After), ``stream`` does the same for
+    ``call_stream`` until its first chunk, ``acall`` runs ``__call__`` in a
+    worker thread. ``abatch``/``batch`` fan a list of requests out with at most
+    ``concurrency`` calls in flight and return the answers in order.
+    """
+    max_retries = 5
+    backoff = 1.0
+    max_backoff = 30.0
+    concurrency = 4
+    # regenerated at the start of every episode
+    session_id = None
+    # (max_side, format, quality) applied to the frames sent to the model
+    image_policy = None
+
+    @property
+    def image_max_side(self) -> int:
+        return self.image_policy[0] if self.image_policy else None
+
+    @abc.abstractmethod
+    def call(self, question: str, image_file: str = None) -> str:
+        """One request to the model, without retries."""
+
+    def call_stream(self, question: str, image_file: str = None):
+        # backends without streaming yield the whole answer at once
+        yield self.call(question, image_file)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """Seconds to wait before retrying ``error``, None if it must be raised."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = retry_after(error)
+        if delay is None:
+            # full jitter keeps concurrent callers from retrying in lockstep
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        return delay
+
+    def __call__(self, question: str, image_file: str = None) -> str:
+        attempt = 0
+        while True:
+            try:
+                return self.call(question, image_file)
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+
+    def stream(self, question: str, image_file: str = None):
+        attempt = 0
+        while True:
+            chunks = self.call_stream(question, image_file)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            # no retries once a chunk is out, the caller may already have acted on it
+            yield first
+            yield from chunks
+            return
+
+    def reset(self):
+        # called at the start of every episode, for agents with per-episode state
+        self.session_id = uuid.uuid4().hex
+
+    def session_headers(self) -> dict:
+        return {SESSION_HEADER: self.session_id} if self.session_id else {}
+
+    async def acall(self, question: str, image_file: str = None) -> str:
+        return await asyncio.to_thread(self, question, image_file)
+
+    async def abatch(self, requests: list, concurrency: int = None, return_exceptions: bool = False) -> list:
+        """``requests`` are dicts of ``acall`` arguments, e.g.
+        ``{"question": ..., "image_file": ...}``."""
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def run(request: dict):
+            async with semaphore:
+                return await self.acall(**request)
+
+        return await asyncio.gather(
+            *(run(request) for request in requests),
+            return_exceptions=return_exceptions
+        )
+
+    def batch(self, requests: list, concurrency: int = None, return_exceptions: bool = False) -> list:
+        # blocking entry point for scripts, use abatch inside a running event loop
+        return asyncio.run(self.abatch(requests, concurrency, return_exceptions))
+
+
+class StreamingAgent:
+    """Drop-in for an agent inside the task chat functions: the answer is
+    streamed and parsed as it arrives, ``on_chunk(parser, completed)`` is
+    called after every chunk with the fields it completed, and the full text
+    is returned as usual."""
+    def __init__(self, agent, on_chunk):
+        self.agent = agent
+        self.on_chunk = on_chunk
+
+    def __call__(self, question: str, image_file: str = None) -> str:
+        parser = JsonStreamParser()
+        for chunk in self.agent.stream(question, image_file):
+            self.on_chunk(parser, parser.feed(chunk))
+        return parser.text
+
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
+
+
+class CachedAgent(BaseAgent):
+    """Answers repeated queries from a ResponseCache.
+
+    The key covers the backend, model, prompt, image content, image policy
+    and max_tokens; with ``bypass`` the cache is only written, e.g. to
+    refresh the stored answers.
+    """
+    def __init__(self, agent, cache, bypass: bool = False):
+        self.agent = agent
+        self.cache = cache
+        self.bypass = bypass
+        # misses go through the wrapped agent, which retries them itself
+        self.max_retries = 0
+        self.concurrency = agent.concurrency
+        self.image_policy = agent.image_policy
+
+    def key(self, question: str, image_file: str = None) -> str:
+        return self.cache.make_key(
+            backend=type(self.agent).__name__,
+            model=self.agent.model_name,
+            max_tokens=getattr(self.agent, "max_tokens", None),
+            question=question,
+            image=self.cache.hash_bytes(frame_store.read(image_file)) if image_file else None,
+            image_policy=self.image_policy,
+        )
+
+    def call(self, question: str, image_file: str = None) -> str:
+        key = self.key(question, image_file)
+        response = None if self.bypass else self.cache.get(key)
+        if response is None:
+            response = self.agent(question, image_file)
+            self.cache.put(key, self.agent.model_name, response)
+        return response
+
+    def call_stream(self, question: str, image_file: str = None):
+        key = self.key(question, image_file)
+        response = None if self.bypass else self.cache.get(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.agent.stream(question, image_file):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, self.agent.model_name, "".join(chunks))
+
+    def reset(self):
+        self.agent.reset()
+
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
@@ -1,30 +1,42 @@
 from openai import OpenAI
 import os
-import base64
-from mimetypes import guess_type
 import json
 
+from agents.base import BaseAgent
+from tools.frame_store import frame_store
+from tools.utils import image_mime
+from tools.http_pool import get_http_client
 
-def encode_image(image_file:str):
-    with open(image_file,"rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+
+def encode_image(image_file:str, policy:tuple=None):
+    return frame_store.b64encode(image_file, policy)
     
-class GPTs:
+class GPTs(BaseAgent):
     def __init__(self, 
                  api_key:str=None,
                  model_name:str="qwen-vl-max",
-                 max_tokens:int=300
+                 max_tokens:int=300,
+                 timeout:float=60,
+                 pool_size:int=10,
+                 http2:bool=True,
+                 base_url:str=None
     ):
         api_key = api_key or os.environ.get("OPENAI_API_KEY",None)
         if not api_key:
             raise Exception("Please provide OPENAI_API_KEY.")
         self.client=OpenAI(
             api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            # BaseAgent retries failed calls with backoff, the SDK must not retry them again
+            max_retries=0,
+            # pooled keep-alive connections shared with the other agents
+            http_client=get_http_client(pool_size, timeout, http2)
         )
         self.model_name=model_name
         self.max_tokens=max_tokens
 
-    def __call__(self, question:str, image_file:str=None):
+    def get_messages(self, question:str, image_file:str=None):
         messages=[
             {
                 "role":"user",
@@ -37,8 +49,8 @@ class GPTs:
             }
         ]
         if image_file:
-            mime_type,_ = guess_type(image_file)
-            strImage=encode_image(image_file)
+            mime_type=image_mime(image_file, self.image_policy)
+            strImage=encode_image(image_file, self.image_policy)
             messages[-1]["content"].append(
                 {
                     "type":"image_url",
@@ -47,10 +59,14 @@ class GPTs:
                     }
                 }
             )
+        return messages
+
+    def call(self, question:str, image_file:str=None):
         completion=self.client.chat.completions.create(
             model=self.model_name,
-            messages=messages,
+            messages=self.get_messages(question, image_file),
             max_tokens=self.max_tokens,
+            extra_headers=self.session_headers(),
             stream=False
         )
 
@@ -58,6 +74,18 @@ class GPTs:
         output=response["choices"][0]["message"]["content"]
 
         return output
+
+    def call_stream(self, question:str, image_file:str=None):
+        chunks=self.client.chat.completions.create(
+            model=self.model_name,
+            messages=self.get_messages(question, image_file),
+            max_tokens=self.max_tokens,
+            extra_headers=self.session_headers(),
+            stream=True
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
 if __name__=="__main__":
     cfg=dict(
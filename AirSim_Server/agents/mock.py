@@ -0,0 +1,178 @@
+import importlib
+import json
+import math
+import random
+import threading
+import time
+
+from agents.base import BaseAgent
+
+# Built-in answers for every TASK_INFO task, replayed from the start of each
+# episode. Every script reaches a pose that passes the task's checker on the
+# mock backend (tools/mock_airsim.py, carrier at cfg.mock.ship_position) and
+# then completes, whatever pose the previous episode left behind: positions
+# are absolute fly_to waypoints and segmentation checks use the bottom camera.
+TASK_SCRIPTS = {
+    "LandOnShip": [
+        {"last_goal_reached": True, "current_goal": "Fly above the aircraft carrier", "action_name": "fly_to", "params": {"x": 600, "y": 2360}, "analysis": "The aircraft carrier is in Sea Area X1, fly above its deck."},
+        {"last_goal_reached": True, "current_goal": "Look at the deck below", "action_name": "switch_view", "params": {}, "analysis": "Switch to the bottom camera to see the deck."},
+        {"last_goal_reached": True, "current_goal": "Land on the aircraft carrier", "action_name": "land", "params": {}, "analysis": "The drone is right above the deck."},
+    ],
+    "FlyToSeaArea": [
+        {"action_name": "fly_to", "params": {"x": 1100, "y": 2500}, "analysis": "Sea Area X1 is centered at (1100, 2500)."},
+        {"action_name": "task_complete", "params": {}, "analysis": "The drone is within Sea Area X1."},
+    ],
+    "SearchForShip": [
+        {"action_name": "switch_view", "params": {}, "analysis": "Look down to search the sea below."},
+        {"action_name": "fly_to", "params": {"x": 1100, "y": 2500}, "analysis": "Search the center of Sea Area X1."},
+        {"action_name": "task_complete", "params": {}, "analysis": "The aircraft carrier is in view."},
+    ],
+    "ApproachShip": [
+        {"action_name": "switch_view", "params": {}, "analysis": "Switch to the bottom camera to align with the deck."},
+        {"action_name": "fly_to", "params": {"x": 1100, "y": 2500}, "analysis": "Fly right above the aircraft carrier."},
+        {"action_name": "task_complete", "params": {}, "analysis": "The deck is in the center of the view."},
+    ],
+    "Delivery": [
+        {"last_goal_reached": True, "current_goal": "Fly above the cargo ship", "action_name": "fly_to", "params": {"x": -2400, "y": 985}, "analysis": "The cargo ship is docked in Bruce Port."},
+        {"last_goal_reached": True, "current_goal": "Look at the cargo ship below", "action_name": "switch_view", "params": {}, "analysis": "Switch to the bottom camera."},
+        {"last_goal_reached": True, "current_goal": "Deliver the cargo", "action_name": "land", "params": {}, "analysis": "The drone is above the cargo ship."},
+    ],
+    "DeliveryFlyToPort": [
+        {"action_name": "fly_to", "params": {"x": -2400, "y": 450}, "analysis": "Bruce Port is to the west."},
+        {"action_name": "task_complete", "params": {}, "analysis": "The drone is in Bruce Port."},
+    ],
+    "DeliverySearchForShip": [
+        # the mock has a single ship, the carrier
+        {"action_name": "switch_view", "params": {}, "analysis": "Look down to search the water below."},
+        {"action_name": "fly_to", "params": {"x": 1100, "y": 2500}, "analysis": "Search where the ship was last seen."},
+        {"action_name": "task_complete", "params": {}, "analysis": "The ship is in view."},
+    ],
+    "DeliveryApproachShip": [
+        {"action_name": "switch_view", "params": {}, "analysis": "Switch to the bottom camera to align with the ship."},
+        {"action_name": "fly_to", "params": {"x": -2400, "y": 985}, "analysis": "Fly right above the cargo ship."},
+        {"action_name": "task_complete", "params": {}, "analysis": "The drone is right above the ship."},
+    ],
+}
+
+RANDOM_ACTIONS = [
+    "turn_left", "turn_right",
+    "move_forward", "move_backward", "move_left", "move_right", "move_up", "move_down",
+    "switch_view",
+]
+
+
+def load_policy(path:str):
+    # "package.module:function"
+    module_name, func_name = path.split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class MockAgent(BaseAgent):
+    """Local stand-in for a VLM: answers with scripted or policy-driven JSON
+    actions for the task found in the prompt, after a latency drawn from a
+    configurable distribution. Needs no network or GPU, so end-to-end runs
+    are repeatable.
+
+    ``mode`` is ``"script"`` (replay the per-task answers) or ``"random"``
+    (seeded random actions); a ``policy`` function overrides both.
+    """
+    def __init__(self,
+        cfg,
+        mode:str="script",
+        max_tokens:int=300
+    ):
+        if mode not in ("script", "random"):
+            raise NotImplementedError(f"Mock agent mode {mode} is not supported yet.")
+        self.cfg = cfg.mock.agent
+        self.mode = mode
+        self.model_name = f"mock__{mode}"
+        self.max_tokens = max_tokens
+
+        self.scripts = dict(TASK_SCRIPTS)
+        if self.cfg.script:
+            with open(self.cfg.script, "r", encoding="utf-8") as f:
+                self.scripts.update(json.load(f))
+        self.policy = load_policy(self.cfg.policy) if self.cfg.policy else None
+
+        # prompts are matched to tasks through the task description
+        from taskInfo import TASK_INFO
+        self.task_descs = sorted(
+            ((info["desc"], task) for task, info in TASK_INFO.items()),
+            key=lambda item: -len(item[0])
+        )
+
+        self.lock = threading.Lock()
+        self.rng = random.Random(self.cfg.seed)
+        self.steps = {}
+
+    def reset(self):
+        # a new episode replays the scripts from their first answer
+        super().reset()
+        with self.lock:
+            self.steps = {}
+
+    def find_task(self, question:str) -> str:
+        for desc, task in self.task_descs:
+            if desc in question:
+                return task
+        return None
+
+    def next_step(self, task:str, session:str=None) -> int:
+        # counted per episode session, so that concurrent episodes each replay their own script
+        with self.lock:
+            step = self.steps.get((session, task), 0)
+            self.steps[(session, task)] = step + 1
+            return step
+
+    def sample_latency(self) -> float:
+        mean, std = self.cfg.latency_mean, self.cfg.latency_std
+        with self.lock:
+            if self.cfg.latency == "constant":
+                latency = mean
+            elif self.cfg.latency == "uniform":
+                latency = self.rng.uniform(mean - std, mean + std)
+            elif self.cfg.latency == "normal":
+                latency = self.rng.gauss(mean, std)
+            elif self.cfg.latency == "lognormal":
+                # parameters of the underlying normal giving the requested mean/std
+                sigma2 = math.log(1 + (std / mean) ** 2) if mean > 0 else 0.0
+                latency = self.rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2)) if mean > 0 else 0.0
+            else:
+                raise NotImplementedError(f"Latency distribution {self.cfg.latency} is not supported yet.")
+        return min(max(latency, self.cfg.latency_min), self.cfg.latency_max)
+
+    def answer(self, question:str, session:str=None) -> str:
+        task = self.find_task(question)
+        step = self.next_step(task, session)
+        if self.policy is not None:
+            response = self.policy(task=task, prompt=question, step=step)
+        elif self.mode == "script":
+            script = self.scripts.get(task, None)
+            if not script:
+                raise ValueError(f"No mock script for task {task}")
+            response = script[step % len(script)]
+        else:
+            with self.lock:
+                done = self.rng.random() < self.cfg.complete_prob
+                action_name = "task_complete" if done else self.rng.choice(RANDOM_ACTIONS)
+            response = {"action_name": action_name, "params": {}, "analysis": f"Random action at step {step}."}
+        return json.dumps(response, ensure_ascii=False, indent=4)
+
+    def call(self, question:str, image_file:str=None, session:str=None) -> str:
+        latency = self.sample_latency()
+        response = self.answer(question, session or self.session_id)
+        time.sleep(latency)
+        return response
+
+    def call_stream(self, question:str, image_file:str=None, session:str=None):
+        latency = self.sample_latency()
+        response = self.answer(question, session or self.session_id)
+        size = max(self.cfg.chunk_size, 1)
+        chunks = [response[i:i + size] for i in range(0, len(response), size)]
+        # time to first chunk, then the rest of the latency spread over the chunks
+        time.sleep(latency * self.cfg.ttft_ratio)
+        interval = latency * (1 - self.cfg.ttft_ratio) / max(len(chunks) - 1, 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(interval)
+            yield chunk
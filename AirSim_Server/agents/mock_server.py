@@ -0,0 +1,126 @@
+import argparse
+import json
+import time
+import uuid
+from flask import Flask, Response, request, jsonify
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configs import get_default_config
+from agents.base import SESSION_HEADER
+from agents.mock import MockAgent
+
+
+def get_question(messages:list) -> str:
+    # text of the last user message, in the OpenAI or the Ollama format
+    content = messages[-1]["content"]
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content if part.get("type") == "text")
+
+
+def create_mock_app(agent:MockAgent) -> Flask:
+    """OpenAI and Ollama compatible chat endpoints answered by a MockAgent,
+    so the real GPTs/QwenVL/OllamaModel clients can be benchmarked against it
+    (set cfg.agent.base_url to this server).
+
+    Scripts are replayed per X-Session-Id header, which the agents renew at
+    the start of every episode, so concurrent episodes do not share a script
+    position. Requests without the header share one position, which only
+    suits a single sequential client.
+    """
+    app = Flask(__name__)
+
+
+    @app.route('/test', methods=['GET', 'POST'])
+    def test():
+        return jsonify({'status': 'success'})
+
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        data = request.get_json()
+        question = get_question(data["messages"])
+        session = request.headers.get(SESSION_HEADER, None)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = data.get("model", agent.model_name)
+
+        if not data.get("stream", False):
+            content = agent.call(question, session=session)
+            return jsonify({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        def events():
+            for chunk in agent.call_stream(question, session=session):
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"role": "assistant", "content": chunk}, "finish_reason": None}],
+                }) + "\n\n"
+            yield "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return Response(events(), mimetype="text/event-stream")
+
+
+    @app.route('/api/chat', methods=['POST'])
+    def ollama_chat():
+        data = request.get_json()
+        question = get_question(data["messages"])
+        session = request.headers.get(SESSION_HEADER, None)
+        model = data.get("model", agent.model_name)
+
+        if not data.get("stream", True):
+            return jsonify({
+                "model": model,
+                "message": {"role": "assistant", "content": agent.call(question, session=session)},
+                "done": True,
+            })
+
+        def lines():
+            for chunk in agent.call_stream(question, session=session):
+                yield json.dumps({"model": model, "message": {"role": "assistant", "content": chunk}, "done": False}) + "\n"
+            yield json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+
+        return Response(lines(), mimetype="application/x-ndjson")
+
+    return app
+
+
+def start_mock_server(cfg, mode:str="script", port:int=None):
+    app = create_mock_app(MockAgent(cfg, mode=mode, max_tokens=cfg.agent.max_tokens))
+    app.run(host='0.0.0.0', port=port or cfg.mock.agent.port, threaded=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config-file", type=str, default=None)
+    parser.add_argument("--mode", type=str, default="script")
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    cfg = get_default_config()
+    if args.config_file:
+        cfg.merge_from_file(args.config_file)
+    start_mock_server(cfg, args.mode, args.port)
@@ -1,39 +1,67 @@
-import base64
-import requests
+import json
 
+from agents.base import BaseAgent
+from tools.frame_store import frame_store
+from tools.http_pool import get_session
 
-class OllamaModel:
+
+class OllamaModel(BaseAgent):
     def __init__(self, 
         model_name: str, 
-        max_tokens: int = 300) -> None:
+        max_tokens: int = 300,
+        timeout: float = 30,
+        pool_size: int = 10,
+        base_url: str = "http://localhost:11434") -> None:
         self.model_name = model_name
         self.max_tokens = max_tokens
-        self.url = "http://localhost:11434/api/chat"
+        self.url = f"{base_url.rstrip('/')}/api/chat"
         self.headers = {"Content-Type": "application/json"}
+        self.timeout = timeout
+        # keep-alive session shared with the other agents
+        self.session = get_session(pool_size)
         
 
-    def __call__(self,question:str,image_file:str=None):
+    def get_payload(self,question:str,image_file:str=None,stream:bool=False):
         payload= {
             "model": self.model_name,
             "messages": [
                 {"role": "user", "content": question}
             ],
             "max_tokens": self.max_tokens,
-            "stream": False,
+            "stream": stream,
         }
         if image_file is not None:
             payload["messages"][0]["images"] = [
-                base64.b64encode(open(image_file, "rb").read()).decode("utf-8")
+                frame_store.b64encode(image_file, self.image_policy)
             ]
-        response = requests.post(
+        return payload
+
+    def call(self,question:str,image_file:str=None):
+        response = self.session.post(
             url=self.url,
-            headers=self.headers,
-            json=payload,
-            timeout=30,
+            headers={**self.headers, **self.session_headers()},
+            json=self.get_payload(question, image_file),
+            timeout=self.timeout,
         )
+        # surface rate limits and server errors so that they are retried
+        response.raise_for_status()
 
         return response.json()["message"]["content"]
 
+    def call_stream(self,question:str,image_file:str=None):
+        with self.session.post(
+            url=self.url,
+            headers={**self.headers, **self.session_headers()},
+            json=self.get_payload(question, image_file, stream=True),
+            timeout=self.timeout,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            # one JSON object per line until "done"
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)["message"]["content"]
+
 if __name__ == "__main__":
     model = OllamaModel("qwen2.5vl:32b")
     print(model("你好"))
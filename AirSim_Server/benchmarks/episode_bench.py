@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import threading
+import time
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configs import get_default_config
+from episodeManager import EpisodeContext
+from taskInfo import TASK_INFO, TASK_MAPPING
+from tools.airsim_controller import AirSimController, VehicleRouter
+from tools.timing import percentile
+from tools.transport import build_transport
+
+# stages reported for every step
+STAGES = ["capture", "prompt", "inference", "parse", "action", "settle", "checker"]
+PERCENTILES = [50, 95, 99]
+
+# local stand-ins, applied before --config-file so that they can be overridden
+BENCH_OPTS = [
+    "airsim.backend", "mock",
+    "agent.model_name", "mock__script",
+    "agent.cache.enabled", False,
+    "mock.agent.latency_mean", 0.1,
+    "mock.agent.latency_std", 0.02,
+    "task.max_steps", 20,
+]
+
+
+def step_stages(timings:dict) -> dict:
+    return {name: timings[name] for name in STAGES if name in timings}
+
+
+def summarize(episodes:list) -> dict:
+    steps = [step for episode in episodes for step in episode["steps"]]
+    wall = sum(episode["wall"] for episode in episodes)
+    stages = {}
+    for name in STAGES:
+        values = [step[name] for step in steps if name in step]
+        if not values:
+            continue
+        stages[name] = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            **{f"p{q}": percentile(values, q) for q in PERCENTILES},
+        }
+    return {
+        "episodes": len(episodes),
+        "completed": sum(episode["completed"] for episode in episodes),
+        "steps": len(steps),
+        "wall": wall,
+        "steps_per_sec": len(steps) / wall if wall else None,
+        "stages": stages,
+    }
+
+
+class EpisodeRunner:
+    """Runs episodes on one EpisodeContext and keeps the per-step timings."""
+    def __init__(self, logger:logging.Logger, cfg, controller):
+        self.messages = []
+        transport = build_transport(cfg, logger, controller)
+        self.context = EpisodeContext(logger, cfg, self.messages.append, transport)
+
+    def run(self, task_name:str) -> dict:
+        task_type = next(key for key, value in TASK_MAPPING.items() if value == task_name)
+        self.messages.clear()
+
+        start = time.perf_counter()
+        asyncio.run(self.context.run(task_type))
+        wall = time.perf_counter() - start
+
+        timer = self.context.timer
+        completed = any(json.loads(message).get("response") == "task_done" for message in self.messages)
+        return {
+            "wall": wall,
+            "completed": completed,
+            "steps": [step_stages(timings) for timings in timer.history],
+        }
+
+
+def report(name:str, summary:dict):
+    print(f"{name:<24} {summary['steps']:>5} steps  {summary['steps_per_sec'] or 0:8.2f} steps/s  "
+          f"{summary['completed']}/{summary['episodes']} completed")
+    for stage, values in summary["stages"].items():
+        print(f"    {stage:<12} " + "  ".join(
+            f"p{q} {values[f'p{q}']*1e3:9.3f} ms" for q in PERCENTILES
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config-file", type=str, default=None)
+    parser.add_argument("--tasks", type=str, nargs="*", default=list(TASK_INFO.keys()))
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None, help="write the results as JSON")
+    parser.add_argument("--opts", nargs="*", default=[], help="config overrides, e.g. task.pipeline True")
+    parser.add_argument("--check", action="store_true", help="exit with an error unless every episode completes")
+    args = parser.parse_args()
+
+    cfg = get_default_config()
+    cfg.merge_from_list(BENCH_OPTS)
+    if args.config_file:
+        cfg.merge_from_file(args.config_file)
+    cfg.merge_from_list(args.opts)
+    cfg.freeze()
+
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    # the controller reads its own config file
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+        f.write(cfg.dump())
+    controller = AirSimController(logger, f.name)
+    os.remove(f.name)
+    if cfg.server.transport == "http":
+        router = VehicleRouter([controller])
+        threading.Thread(target=router.start_server, args=(cfg.server.airsim_port,), daemon=True).start()
+        time.sleep(1.0)
+
+    runner = EpisodeRunner(logger, cfg, controller)
+    results = {}
+    all_episodes = []
+    for task_name in args.tasks:
+        if task_name not in TASK_INFO:
+            raise ValueError(f"Unknown task: {task_name}")
+        episodes = [runner.run(task_name) for _ in range(args.episodes)]
+        all_episodes.extend(episodes)
+        results[task_name] = summarize(episodes)
+        report(task_name, results[task_name])
+
+    output = {
+        "config": {
+            "backend": cfg.airsim.backend,
+            "model_name": cfg.agent.model_name,
+            "transport": cfg.server.transport,
+            "pipeline": cfg.task.pipeline,
+            "prefetch_view": cfg.task.prefetch_view,
+            "stream": cfg.agent.stream,
+            "max_steps": cfg.task.max_steps,
+            "episodes": args.episodes,
+        },
+        "tasks": results,
+        "overall": summarize(all_episodes),
+    }
+    report("overall", output["overall"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+
+    if args.check:
+        failed = [name for name, summary in results.items() if summary["completed"] < summary["episodes"]]
+        if failed:
+            sys.exit(f"Episodes not completed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
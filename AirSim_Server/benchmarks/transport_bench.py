@@ -0,0 +1,81 @@
+import argparse
+import logging
+import statistics
+import threading
+import time
+
+import requests
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.airsim_controller import create_control_app
+from tools.transport import HttpTransport, LocalTransport
+
+
+class EchoController:
+    """Stands in for AirSimController so that only the transport cost is measured."""
+    def exec_action(self, action) -> dict:
+        return {"x": 0, "y": 0, "z": 0, "view": "forward-looking"}
+
+
+def bench(call, payload:dict, n:int) -> list:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call(payload)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name:str, timings:list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<28} mean {statistics.mean(timings)*1e3:8.3f} ms   "
+          f"p50 {statistics.median(timings)*1e3:8.3f} ms   p95 {p95*1e3:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=28181)
+    args = parser.parse_args()
+
+    logger = logging.getLogger(__name__)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    controller = EchoController()
+    app = create_control_app(controller)
+    threading.Thread(
+        target=app.run,
+        kwargs={"host": "127.0.0.1", "port": args.port},
+        daemon=True
+    ).start()
+
+    url = f"http://127.0.0.1:{args.port}"
+    for _ in range(50):
+        try:
+            requests.get(f"{url}/test")
+            break
+        except requests.ConnectionError:
+            time.sleep(0.1)
+
+    payload = {"action_name": "get_position_and_view", "action_params": {}}
+
+    # the transport TaskHelper used before: a fresh connection per call
+    def post(payload):
+        return requests.post(f"{url}/control", json=payload).json()
+
+    transports = {
+        "http (new connection)": post,
+        "http (keep-alive)": HttpTransport(logger, url),
+        "local": LocalTransport(logger, controller),
+    }
+    for name, call in transports.items():
+        bench(call, payload, 20)
+        report(name, bench(call, payload, args.n))
+
+
+if __name__ == "__main__":
+    main()
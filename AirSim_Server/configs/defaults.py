@@ -14,6 +14,57 @@ def get_default_config():
     # 默认颜色文件路径，根据实际情况修改
     cfg.color_file = "configs/seg_rgbs.txt"
 
+    # AirSim仿真器地址，ip为空时使用本机
+    cfg.airsim = CN()
+    cfg.airsim.ip = ""
+    cfg.airsim.port = 41451
+    # 同一仿真器中并行执行任务的无人机名称（需在AirSim settings.json中定义），为空时使用默认无人机
+    cfg.airsim.vehicles = []
+    # 多架无人机初始位置沿y轴的间隔
+    cfg.airsim.vehicle_spacing = 20.0
+    # 仿真后端："airsim"为真实仿真器，"mock"为无需Unreal的模拟客户端（用于压测与基准测试）
+    cfg.airsim.backend = "airsim"
+
+    # 模拟仿真器参数（cfg.airsim.backend = "mock"时生效）
+    cfg.mock = CN()
+    # 每次RPC调用的附加延迟（秒）
+    cfg.mock.rpc_latency = 0.002
+    # 每张图像的渲染延迟（秒）
+    cfg.mock.image_latency = 0.01
+    # 机动耗时相对真实飞行时间的比例，0表示瞬间完成
+    cfg.mock.time_scale = 0.01
+    # 合成图像的尺寸[高, 宽]
+    cfg.mock.image_size = [720, 1280]
+    # 航母模型名称、位置（NED坐标）与半径
+    cfg.mock.ship_mesh = "BPA_West_Carrier_CVN76_9"
+    cfg.mock.ship_position = [1100.0, 2500.0, 0.0]
+    cfg.mock.ship_radius = 150.0
+
+    # 模拟模型参数（cfg.agent.model_name为"mock__script"/"mock__random"时生效）
+    cfg.mock.agent = CN()
+    # 各任务的动作脚本（JSON文件，{任务名: [回答, ...]}），为空时使用内置脚本
+    cfg.mock.agent.script = ""
+    # 自定义策略函数"module:function"，参数为(task, prompt, step)，返回回答字典
+    cfg.mock.agent.policy = ""
+    # 回答耗时分布：constant/uniform/normal/lognormal
+    cfg.mock.agent.latency = "lognormal"
+    # 耗时的均值与标准差（秒），uniform时为[mean-std, mean+std]
+    cfg.mock.agent.latency_mean = 1.0
+    cfg.mock.agent.latency_std = 0.3
+    # 耗时的上下限（秒）
+    cfg.mock.agent.latency_min = 0.0
+    cfg.mock.agent.latency_max = 10.0
+    # 流式输出时首个片段耗时占总耗时的比例
+    cfg.mock.agent.ttft_ratio = 0.3
+    # 流式输出每个片段的字符数
+    cfg.mock.agent.chunk_size = 16
+    # mock__random每步给出task_complete的概率
+    cfg.mock.agent.complete_prob = 0.1
+    # 随机种子，保证多次运行结果一致
+    cfg.mock.agent.seed = 0
+    # OpenAI/Ollama兼容的模拟模型服务端口
+    cfg.mock.agent.port = 11435
+
     # 无人机初始化位置与姿态
     cfg.init_pose = CN()
     cfg.init_pose.position = [500, 2100, -50]
@@ -33,10 +84,43 @@ def get_default_config():
     cfg.control.yaw_rate = 30.0  # Yaw速度
     cfg.control.rotate_step = 3  # 转向步长时间
 
+    # 动作执行后等待无人机稳定
+    cfg.control.settle_velocity = 0.2  # 线速度阈值（m/s）
+    cfg.control.settle_angular_rate = 0.05  # 角速度阈值（rad/s）
+    cfg.control.settle_interval = 0.1  # 状态轮询间隔（秒）
+    cfg.control.settle_timeout = 3.0  # 最长等待时间（秒）
+
     # 长距离飞行
     cfg.control.cruise_velocity = 100.0  # 巡航飞行速度
     cfg.control.cruise_altitude = -120.0  # 巡航飞行高度
 
+    # 图像采集参数
+    cfg.capture = CN()
+    # 图像保存格式：png直接保存AirSim压缩后的原始数据，jpg/webp从未压缩图像编码一次
+    cfg.capture.format = "png"
+    # jpg/webp编码质量（0-100）
+    cfg.capture.quality = 90
+
+    # 内存帧缓存参数
+    cfg.frame_store = CN()
+    # 是否启用内存帧缓存，关闭时图像直接写入磁盘
+    cfg.frame_store.enabled = True
+    # 最多缓存的帧数
+    cfg.frame_store.max_frames = 64
+    # 最多缓存的字节数
+    cfg.frame_store.max_bytes = 256 * 1024 * 1024
+    # 是否异步写入磁盘备份（仅用于审计）
+    # server.transport为http时图像由其他进程读取，总是在返回路径前同步写入磁盘
+    cfg.frame_store.spill = False
+    # 发送给模型的base64图像编码缓存的最大字节数
+    cfg.frame_store.max_encoded_bytes = 64 * 1024 * 1024
+
+    # 链路追踪：记录每个回合、每一步各阶段的耗时（span），按episode_id与step关联
+    cfg.tracing = CN()
+    cfg.tracing.enabled = False
+    # span导出文件（每行一个JSON，字段与OpenTelemetry一致）
+    cfg.tracing.path = "logs/traces.jsonl"
+
     # 任务参数
     cfg.task = CN()
 
@@ -45,6 +129,12 @@ def get_default_config():
     # 任务最大允许执行步数
     cfg.task.max_steps = 50
 
+    # 流水线模式：动作执行时并行向前端推送结果
+    cfg.task.pipeline = False
+    # 流水线模式下推理时预先采集另一相机的图像，模型选择switch_view时省去一次采集
+    # 其余动作会浪费这次采集，默认关闭
+    cfg.task.prefetch_view = False
+
     # 任务判定
     # 判断货船是否在视野中的像素比例阈值
     cfg.task.ship_visible_threshold = 0.015
@@ -63,11 +153,49 @@ def get_default_config():
     cfg.server.airsim_port = 28080
     # websockets端口
     cfg.server.ws_port = 38080
+    # airsim控制服务地址（远程部署时修改）
+    cfg.server.airsim_host = "localhost"
+    # TaskHelper与控制器之间的通信方式：
+    # "local"为同进程直接调用，"http"为通过控制服务器调用
+    cfg.server.transport = "local"
+    # http请求超时时间（秒），None表示不超时
+    cfg.server.timeout = None
+    # 多个仿真器并行执行任务时的地址列表，如["127.0.0.1:41451", "127.0.0.1:41452"]
+    # 为空时只使用cfg.airsim指定的仿真器；第i个仿真器的控制服务端口为airsim_port + i
+    cfg.server.simulators = []
 
     cfg.agent = CN()
     cfg.agent.model_name = "ollama__qwen2.5vl:7b"
     cfg.agent.api_key = ""
+    # 模型服务地址，为空时使用各后端的默认地址（可指向本地模拟模型服务）
+    cfg.agent.base_url = ""
     cfg.agent.max_tokens = 300
+    # 模型请求超时时间（秒）
+    cfg.agent.timeout = 60.0
+    # 每个模型服务保持的最大连接数，并行任务较多时调大
+    cfg.agent.pool_size = 10
+    # 安装h2后对OpenAI兼容接口使用HTTP/2
+    cfg.agent.http2 = True
+    # 限流或网络错误时的最大重试次数
+    cfg.agent.max_retries = 5
+    # 批量调用时同时进行的最大请求数
+    cfg.agent.concurrency = 4
+    # 流式输出：动作参数生成后立即执行，分析内容边生成边推送到前端
+    cfg.agent.stream = False
+    # 发送给模型前的图像处理策略（缓存后每帧只处理一次）
+    cfg.agent.image = CN()
+    # 图像长边的最大像素数，0表示不缩放
+    cfg.agent.image.max_side = 0
+    # 重新编码的格式（png/jpg/webp），为空时保持采集格式
+    cfg.agent.image.format = ""
+    # jpg/webp编码质量（0-100）
+    cfg.agent.image.quality = 85
+    # 模型回答的本地持久化缓存（相同提示词、图像与参数直接返回缓存结果）
+    cfg.agent.cache = CN()
+    cfg.agent.cache.enabled = False
+    cfg.agent.cache.path = "cache/responses.sqlite3"
+    # 跳过缓存读取，仍写入新的回答
+    cfg.agent.cache.bypass = False
 
     return cfg.clone()
 
@@ -0,0 +1,504 @@
+import asyncio
+import contextvars
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import sys
+import uuid
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configs import FRONT, BOTTOM
+from agents import build_agent
+from agents.base import StreamingAgent
+from tools.transport import build_transport
+from tools.async_controller import is_motion
+from tools.timing import StageTimer, TimedAgent, format_timings, CURRENT_TIMER
+from tools.tracing import tracer, configure_tracing
+from taskInfo import TASK_INFO, TASK_MAPPING
+
+class EpisodeContext:
+    """State of one episode, bound to its own AirSim endpoint and agent."""
+    def __init__(self,
+                 logger: logging.Logger,
+                 cfg,
+                 send,
+                 transport,
+                 index: int = 0):
+        self.logger = logger
+        self.cfg = cfg
+        self.send = send
+        self.index = index
+
+        # how actions reach this context's AirSim controller
+        self.transport = transport
+        self.agent = build_agent(self.cfg)
+
+        # per-stage timings of the steps of the current episode
+        self.timer = StageTimer()
+        configure_tracing(self.cfg)
+        # pipelined mode with task.prefetch_view: speculative captures run here while the model generates
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"prefetch-{index}")
+        self.prefetched = None
+        # streaming mode: action started before the model finished its answer
+        self.dispatched = None
+        self.streamed_analysis = ""
+
+        self.task_start = False
+        self.task_complete = False
+
+        self.cur_step = 0
+        self.prompt_template = None
+
+        self.last_goal = "none(currently the first step)"
+        self.task_complete_actions = []
+
+        self.needEnforcement = False
+
+        self.taskInfoInitialized = False
+
+    async def run(self, task_type:str):
+        try:
+            await asyncio.to_thread(self.init_task_info, task_type)
+            # stages timed by the task code (e.g. parse) land in this episode's steps
+            CURRENT_TIMER.set(self.timer)
+            # one trace per episode, every stage of a step is a child of its step span
+            with tracer.span("episode", episode_id=self.episode_id, task_name=self.task_name, context=self.index):
+                while not self.task_complete:
+                    # blocking simulator and model calls stay off the event loop
+                    with tracer.span("step", step=self.cur_step + 1):
+                        await asyncio.to_thread(self.step)
+            self.logger.info(f"Episode {self.episode_id} stage timings: {self.timer.summary()}")
+        except Exception as e:
+            self.logger.error(f"Failed to start task {task_type}: {str(e)}")
+            self.send(
+                json.dumps({
+                    "role": "system",
+                    "response": f"任务启动失败: {str(e)}"
+                })
+            )
+            self.taskInfoInitialized = False
+            self.task_start = False
+            self.task_complete = True
+
+    def init_task_info(self, task_type:str):
+        task_type = TASK_MAPPING.get(task_type, None)
+        if not task_type:
+            raise ValueError(f"Unknown task type: {task_type}")
+        task_info = TASK_INFO.get(task_type, None)
+        if not task_info:
+            raise ValueError(f"Unknown task info for type: {task_type}")
+        
+        self.task_name = task_info["name"]
+        self.task_desc = task_info["desc"]
+        self.get_prompt_func = task_info["get_prompt_func"]
+        self.force_prompt = task_info["force_prompt"]
+        self.chat_func = task_info["chat_func"]
+        self.checker_func = task_info["checker_func"]
+        self.response_formatter = task_info["response_formatter"]
+        # extra params of the segmentation statistics passed to the checker
+        self.segmentation_params = task_info.get("segmentation_params", {})
+
+        self.cur_step = 0
+        self.view = self.cfg.view
+        self.last_goal = "none(currently the first step)"
+        # prefix of the ids of every frame captured during this episode
+        self.episode_id = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.timer.reset()
+        self.prefetched = None
+
+        self.task_complete_actions = task_info["task_complete_actions"]
+        self.agent.reset()
+
+        # the controller keeps its camera between episodes, start from cfg.view like self.view
+        if self.airsim_control({"action_name": "get_position_and_view", "action_params": {}})["view"] != self.view:
+            self.airsim_control({"action_name": "switch_view", "action_params": {}})
+
+        if "position" in task_info or "orientation" in task_info:
+            position = task_info.get("position", None)
+            if position is not None:
+                # vehicles sharing a simulator keep their spacing, as at startup
+                vehicles = list(self.cfg.airsim.vehicles) or [""]
+                position = list(position)
+                position[1] += (self.index % len(vehicles)) * self.cfg.airsim.vehicle_spacing
+            quaternion = task_info.get("orientation", None)
+            self.airsim_control(
+                {
+                    "action_name": "set_pose",
+                    "action_params": {
+                        "position": position,
+                        "quaternion": quaternion
+                    }
+                }
+            )
+
+        self.taskInfoInitialized = True
+        self.logger.info(f"Initialized task info for {task_type}")
+        self.task_complete = False
+        self.task_start = True
+
+    def airsim_control(self, payload:dict):
+        with tracer.span("airsim_control", action_name=payload["action_name"]):
+            return self.transport(payload)
+
+    def airsim_control_batch(self, payloads:list):
+        with tracer.span("airsim_control", action_name=",".join(payload["action_name"] for payload in payloads)):
+            return self.transport.batch(payloads)
+
+    def frame_params(self) -> dict:
+        return {"episode_id": self.episode_id, "step": self.cur_step}
+
+    def capture(self, view:str=None) -> tuple:
+        # frame, position and view in one round trip; view selects another camera
+        image, pos_and_view = self.airsim_control_batch([
+            {"action_name": "get_image", "action_params": {"view": view, **self.frame_params()}},
+            {"action_name": "get_position_and_view", "action_params": {}},
+        ])
+        pos = (pos_and_view["x"], pos_and_view["y"], pos_and_view["z"])
+        return image["image_path"], pos, view or pos_and_view["view"]
+
+    def observe(self) -> str:
+        if self.prefetched is not None:
+            # captured while the model was generating the previous action
+            frame, self.pos, self.view = self.prefetched
+            self.prefetched = None
+            return frame
+
+        with self.timer.stage("capture"):
+            frame, self.pos, self.view = self.capture()
+        return frame
+
+    def prefetch_switched_view(self):
+        # speculative frame of the other camera, used if the model picks switch_view
+        view = BOTTOM if self.view == FRONT else FRONT
+        start = time.perf_counter()
+        observation = self.capture(view)
+        return observation, time.perf_counter() - start
+
+    def get_prompt(self):
+        prompt = self.get_prompt_func(
+            task_name=self.task_name,
+            task_desc=self.task_desc,
+            position=self.pos,
+            view=self.view,
+            last_goal=self.last_goal
+        )
+
+        if self.needEnforcement:
+            prompt += self.force_prompt
+            self.needEnforcement = False
+
+        self.logger.info(f"Generated prompt: {prompt}")
+        return prompt
+    
+    def chat(self, frame:str):
+        with self.timer.stage("prompt"):
+            prompt = self.get_prompt()
+
+        self.logger.info(f"Chatting with model: {self.cfg.agent.model_name}")
+
+        agent = self.agent
+        if self.cfg.agent.stream:
+            self.dispatched = None
+            self.streamed_analysis = ""
+            agent = StreamingAgent(self.agent, self.on_stream)
+
+        response = self.chat_func(
+            prompt=prompt,
+            frame=frame,
+            agent=TimedAgent(agent, self.timer),
+            pos=self.pos,
+            view=self.view,
+            task_name=self.task_name,
+            task_desc=self.task_desc,
+            cur_step=self.cur_step
+        )
+
+        return response
+    
+    def on_stream(self, parser, completed:dict):
+        fields = parser.fields
+        if (
+            self.dispatched is None
+            and "action_name" in fields
+            and "params" in fields
+            and fields["action_name"] not in self.task_complete_actions
+        ):
+            # the action is complete, start it while the analysis is still streaming
+            action = {
+                "action_name": fields["action_name"],
+                "action_params": fields["params"] or {}
+            }
+            self.logger.info(f"Executing action: {action['action_name']} with params: {action['action_params']}")
+            self.dispatched = (self.transport.submit(action), time.perf_counter(), action)
+
+        analysis = parser.partial("analysis")
+        if analysis and len(analysis) > len(self.streamed_analysis):
+            self.send(
+                json.dumps({
+                    "role": "model",
+                    "delta": analysis[len(self.streamed_analysis):],
+                })
+            )
+            self.streamed_analysis = analysis
+
+    def cancel_action(self, handle):
+        # stop an action the final answer did not confirm before anything else runs
+        try:
+            handle.cancel()
+            handle.wait()
+        except Exception as e:
+            self.logger.error(f"Failed to cancel action {handle.action_id}: {str(e)}")
+
+    def wait_settled(self):
+        with self.timer.stage("settle"):
+            settle = self.airsim_control({
+                "action_name": "wait_settled",
+                "action_params": {}
+            })
+        self.logger.info(f"Drone settled: {settle['settled']} after {settle['waited']:.2f}s")
+
+    def checker(self):
+        with self.timer.stage("checker"):
+            return self.check()
+
+    def check(self):
+        self.logger.info("Checking task completion...")
+
+        pos_and_view, observation = self.airsim_control_batch([
+            {"action_name": "get_position_and_view", "action_params": {}},
+            {
+                "action_name": "capture_observation",
+                "action_params": {
+                    "scene": True,
+                    "segmentation": True,
+                    "seg_stats": True,
+                    **self.segmentation_params,
+                    **self.frame_params()
+                }
+            },
+        ])
+        pos = (pos_and_view["x"], pos_and_view["y"], pos_and_view["z"])
+        view = pos_and_view["view"]
+        seg_stats = observation["seg_stats"]
+        seg_mask = observation.get("seg_mask", None)
+
+        frame = observation["image_path"]
+
+        return self.checker_func(
+            pos=pos,
+            view=view,
+            frame=frame,
+            task_name=self.task_name,
+            task_desc=self.task_desc,
+            seg_stats=seg_stats,
+            seg_mask=seg_mask,
+        )
+    
+    def step(self):
+        speculative = None
+        try:
+            if not self.taskInfoInitialized:
+                self.task_start = False
+                self.task_complete = True
+                self.logger.info("Task info not initialized, skipping task.")
+                self.send(
+                    json.dumps({
+                        "role": "system",
+                        "response": "任务信息未成功初始化，跳过任务执行。"
+                    })
+                )
+                return
+
+            self.cur_step += 1
+            self.logger.info(f"Current step: {self.cur_step}")
+            if self.cur_step > self.cfg.task.max_steps:
+                self.logger.info("Reached max steps, stopping task.")
+                self.task_start = False
+                self.task_complete = True
+                if not self.checker():
+                    self.logger.info("Task not completed.")
+                    self.send(
+                        json.dumps({
+                            "role": "system",
+                            "response": "任务执行超过最大步数，任务失败。"
+                        })
+                    )
+                else:
+                    self.logger.info("Task completed successfully despite max steps.")
+                    self.send(
+                        json.dumps({
+                            "role": "system",
+                            "response": "任务执行超过最大步数，但任务完成。"
+                        })
+                    )
+                self.taskInfoInitialized = False
+                return
+
+            frame = self.observe()
+            self.logger.info(f"Frame captured: {frame}")
+
+            # send the frame to the frontend for visualization
+            self.send(
+                json.dumps({
+                    "role": "model",
+                    "image": os.path.basename(frame),
+                })
+            )
+
+            if self.cfg.task.pipeline and self.cfg.task.prefetch_view:
+                # in this step's context so that the capture is traced under it
+                speculative = self.prefetch_executor.submit(contextvars.copy_context().run, self.prefetch_switched_view)
+
+            with self.timer.stage("chat"):
+                response = self.chat(frame)
+            self.logger.info(f"Model response: {response}")
+
+            self.last_goal = response.get("current_goal", "none")
+
+            action = {
+                "action_name": response["action_name"],
+                "action_params": response.get("params", None) or {}
+            }
+            handle = None
+            if self.dispatched is not None:
+                # started while the model was still writing its analysis
+                handle, action_start, dispatched_action = self.dispatched
+                self.dispatched = None
+                if dispatched_action != action:
+                    self.logger.info(f"Final answer changed the action, cancelling {dispatched_action['action_name']}")
+                    self.cancel_action(handle)
+                    handle = None
+            if handle is None and self.cfg.task.pipeline and response['action_name'] not in self.task_complete_actions:
+                # start the action first and report the response while it runs
+                self.logger.info(f"Executing action: {response['action_name']} with params: {response.get('params', {})}")
+                action_start = time.perf_counter()
+                handle = self.transport.submit(action)
+
+            content = self.response_formatter(response)
+            self.logger.info(f"Formatted response: {content}")
+
+            self.send(
+                json.dumps({
+                    "role": "model",
+                    "response": content,
+                })
+            )
+
+            if response['action_name'] in self.task_complete_actions:
+                # check if the task is complete
+                if not self.checker():
+                    self.logger.info("Task not complete, force execution.")
+                    self.needEnforcement = True
+                    self.send(
+                        json.dumps({
+                            "role": "system",
+                            "response": "任务未完成，继续执行。"
+                        })
+                    )
+                    return
+                else:
+                    self.logger.info("Task completed successfully.")
+                    self.task_start = False
+                    self.task_complete = True
+                    self.send(
+                        json.dumps({
+                            "role": "system",
+                            "response": "task_done"
+                        })
+                    )
+                    self.taskInfoInitialized = False
+            elif handle is not None:
+                handle.result()
+                self.timer.add("action", time.perf_counter() - action_start)
+                tracer.record("action", action_start, action_name=response['action_name'])
+
+                if response['action_name'] == "switch_view" and speculative is not None:
+                    # the other camera was already captured during inference
+                    self.prefetched, saved = speculative.result()
+                    self.timer.add("capture_saved", saved)
+                if is_motion(response['action_name']):
+                    self.wait_settled()
+            else:
+                self.logger.info(f"Executing action: {response['action_name']} with params: {response.get('params', {})}")
+                with self.timer.stage("action"):
+                    self.airsim_control(action)
+
+                self.wait_settled()
+        except Exception as e:
+            self.logger.error(f"Error during task execution: {str(e)}")
+            self.send(
+                json.dumps({
+                    "role": "system",
+                    "response": f"任务执行过程中发生错误: {str(e)}"
+                })
+            )
+            self.taskInfoInitialized = False
+            self.task_start = False
+            self.task_complete = True
+        finally:
+            if self.dispatched is not None:
+                # the answer failed to parse after its action was started
+                self.cancel_action(self.dispatched[0])
+                self.dispatched = None
+            if speculative is not None and not speculative.cancel():
+                # unused or not, the speculative capture must not overlap the next capture
+                speculative.exception()
+            # closed here so that the last step of an episode is recorded too
+            timings = self.timer.new_step()
+            if timings:
+                self.logger.info(f"Step {self.cur_step} timings: {format_timings(timings)}")
+
+
+class EpisodeManager:
+    """Owns one episode context per simulator endpoint and runs the queued
+    tasks on whichever context is free, in the order they were received."""
+    def __init__(self,
+                 logger: logging.Logger,
+                 cfg,
+                 send,
+                 controllers: list = None):
+        self.logger = logger
+        self.cfg = cfg
+
+        # one context per vehicle of every simulator, in the order of the controllers
+        simulators = max(len(self.cfg.server.simulators), 1)
+        vehicles = list(self.cfg.airsim.vehicles) or [""]
+        self.contexts = []
+        for i in range(simulators * len(vehicles)):
+            controller = controllers[i] if controllers else None
+            transport = build_transport(
+                self.cfg,
+                self.logger,
+                controller,
+                index=i // len(vehicles),
+                vehicle_name=vehicles[i % len(vehicles)]
+            )
+            self.contexts.append(EpisodeContext(self.logger, self.cfg, send, transport, index=i))
+
+        self.loop = None
+        self.queue = asyncio.Queue()
+
+    def submit(self, task_type:str):
+        # called from the WebSocket thread
+        task_name = TASK_MAPPING.get(task_type, None)
+        if task_name not in TASK_INFO:
+            raise ValueError(f"Unknown task type: {task_type}")
+        if self.loop is None:
+            raise RuntimeError("Episode manager is not running yet.")
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, task_type)
+
+    async def worker(self, context: EpisodeContext):
+        while True:
+            task_type = await self.queue.get()
+            self.logger.info(f"Running task {task_type} on episode context {context.index}")
+            try:
+                await context.run(task_type)
+            finally:
+                self.queue.task_done()
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        await asyncio.gather(*(self.worker(context) for context in self.contexts))
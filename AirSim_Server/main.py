@@ -32,11 +32,25 @@ async def main():
 
     threading.Thread(target=start_file_server, args=(logger,)).start()
 
-    controller = AirSimController(logger, parser.config_file)
-
-    threading.Thread(target=controller.start_server).start()
-
-    task_helper = TaskHelper(logger, parser.config_file)
+    cfg = get_default_config()
+    if parser.config_file:
+        cfg.merge_from_file(parser.config_file)
+
+    # one controller per vehicle and one control server per simulator instance
+    simulators = cfg.server.simulators or [f"{cfg.airsim.ip}:{cfg.airsim.port}"]
+    vehicles = cfg.airsim.vehicles or [""]
+    controllers = []
+    for i, simulator in enumerate(simulators):
+        ip, port = simulator.rsplit(":", 1)
+        vehicle_controllers = [
+            AirSimController(logger, parser.config_file, ip=ip, port=int(port), vehicle_name=vehicle_name)
+            for vehicle_name in vehicles
+        ]
+        router = VehicleRouter(vehicle_controllers)
+        threading.Thread(target=router.start_server, args=(cfg.server.airsim_port + i,)).start()
+        controllers.extend(vehicle_controllers)
+
+    task_helper = TaskHelper(logger, parser.config_file, controllers=controllers)
     await task_helper.run()
 
 
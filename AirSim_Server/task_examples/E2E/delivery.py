@@ -36,7 +36,7 @@ def get_prompt(task_desc, position, view, last_goal, **kwargs):
 # 7. function to get the next action from the agent
 def chat(prompt, frame, agent, pos, view, task_name, task_desc, cur_step, **kwargs):
     if view == "downward-looking":
-        frame = draw_box(frame)
+        frame = draw_box(frame, max_side=agent.image_max_side)
     response = agent(
         question=prompt,
         image_file=frame,
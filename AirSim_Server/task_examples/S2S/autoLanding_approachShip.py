@@ -1,5 +1,4 @@
 import shapely.geometry as sg
-import cv2
 
 from tools.utils import draw_box, extract_json
 from task_examples.prompt_exapmles.prompt4LandOnShip import PROMPT_S2S
@@ -53,14 +52,14 @@ def chat(prompt, frame, agent, pos, view, task_name, task_desc, cur_step, **kwar
 
 # ------------------------------------------------------
 # 7. function to check if the task is completed
-def checker(seg_mask, view, **kwargs):
+# size of the center region of the view checked by the checker
+segmentation_params = {"center_size": 100}
+
+def checker(seg_stats, view, **kwargs):
     if view != "downward-looking":
         return False
-    seg = cv2.imread(seg_mask, cv2.IMREAD_GRAYSCALE)
     # Check if the aircraft carrier is just in the center of the view
-    height, width = seg.shape
-    center_region = seg[height//2-50:height//2+50, width//2-50:width//2+50]
-    return cv2.countNonZero(center_region) > cfg.task.ship_visible_threshold * center_region.size
+    return seg_stats[str(cfg.ship_id)]["center_coverage"] > cfg.task.ship_visible_threshold
 
 # ------------------------------------------------------
 # 8. function to format the response for frontend display
@@ -84,6 +83,7 @@ INFO = {
     "get_prompt_func": get_prompt,
     "chat_func": chat,
     "checker_func": checker,
+    "segmentation_params": segmentation_params,
     "response_formatter": format_response,
     "force_prompt": force_prompt,
     "task_complete_actions": task_complete_actions,
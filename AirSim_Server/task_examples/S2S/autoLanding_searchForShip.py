@@ -1,5 +1,4 @@
 import shapely.geometry as sg
-import cv2
 
 from tools.utils import  extract_json
 from task_examples.prompt_exapmles.prompt4LandOnShip import PROMPT_S2S
@@ -53,10 +52,9 @@ def chat(prompt, frame, agent, pos, view, task_name, task_desc, cur_step, **kwar
 
 # ------------------------------------------------------
 # 7. function to check if the task is completed
-def checker(seg_mask, **kwargs):
-    seg = cv2.imread(seg_mask, cv2.IMREAD_GRAYSCALE)
+def checker(seg_stats, **kwargs):
     # Check if the aircraft carrier is present in the segmentation mask
-    return cv2.countNonZero(seg) > cfg.task.ship_visible_threshold * seg.size
+    return seg_stats[str(cfg.ship_id)]["coverage"] > cfg.task.ship_visible_threshold
 
 # ------------------------------------------------------
 # 8. function to format the response for frontend display
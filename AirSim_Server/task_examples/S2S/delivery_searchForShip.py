@@ -1,8 +1,9 @@
 import shapely.geometry as sg
-import numpy as np
 
 from tools.utils import extract_json
 from task_examples.prompt_exapmles.prompt4Delivery import PROMPT_S2S
+from configs.defaults import get_default_config
+cfg = get_default_config()
 
 ## Search for Ship Task
 # ------------------------------------------------------
@@ -56,8 +57,8 @@ def chat(prompt, frame, agent, pos, view, task_name, task_desc, cur_step, **kwar
 
 # ------------------------------------------------------
 # 8. function to check if the task is completed
-def checker(seg_mask, **kwargs):
-    if np.sum(seg_mask) > 100:
+def checker(seg_stats, **kwargs):
+    if seg_stats[str(cfg.ship_id)]["pixels"] > 100:
         return True
     return False
 
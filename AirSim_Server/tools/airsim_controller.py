@@ -3,12 +3,11 @@ import airsim
 import cv2
 import numpy as np
 import functools
+import itertools
 from copy import deepcopy
 import base64
 import math
-import pyautogui
-import re
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import logging
 
 import os
@@ -16,9 +15,34 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from configs import *
+from tools.frame_store import frame_store, configure_frame_store
+from tools.segmentation import load_color_map, pack_rgb, object_mask, object_stats
+from tools.async_controller import AsyncAirSimController, LockedClient
+from tools.tracing import tracer, configure_tracing
+from tools.metrics import registry, CONTENT_TYPE
+
+# shared by all controllers in the process so frame ids never repeat
+FRAME_COUNTER = itertools.count(1)
+
+ACTION_REQUESTS = registry.counter(
+    "bedi_control_actions_total",
+    "Actions executed by the AirSim controllers",
+    ("action_name", "status")
+)
+ACTION_LATENCY = registry.histogram(
+    "bedi_control_action_seconds",
+    "Execution time of the actions of the AirSim controllers",
+    ("action_name",)
+)
 
 class AirSimController():
-    def __init__(self, logger:logging.Logger, config_file:str=None) -> None:
+    def __init__(self,
+        logger:logging.Logger,
+        config_file:str=None,
+        ip:str=None,
+        port:int=None,
+        vehicle_name:str="",
+    ) -> None:
         self.logger = logger
 
         self.cfg = get_default_config()
@@ -27,22 +51,33 @@ class AirSimController():
             self.cfg.merge_from_file(config_file)
             self.cfg.freeze()
 
+        # simulator endpoint, defaults to cfg.airsim
+        self.ip = ip if ip is not None else self.cfg.airsim.ip
+        self.port = port if port is not None else self.cfg.airsim.port
+        # vehicle of the simulator driven by this controller ("" is the default one)
+        self.vehicle_name = vehicle_name
+
         self.cur_view = self.cfg.view
 
+        # captured frames are kept in memory and shared with the other components
+        configure_frame_store(self.cfg)
+        configure_tracing(self.cfg)
+        # frames captured outside of an episode are grouped under this id
+        self.session_id = time.strftime('%Y%m%d%H%M%S')
+
+        # vehicles sharing a simulator start side by side
+        init_position = list(self.cfg.init_pose.position)
+        if self.vehicle_name in self.cfg.airsim.vehicles:
+            init_position[1] += self.cfg.airsim.vehicles.index(self.vehicle_name) * self.cfg.airsim.vehicle_spacing
+
         # some basic info
         self.status = {
-            "initPose" : airsim.Pose(airsim.Vector3r(*self.cfg.init_pose.position), airsim.Quaternionr(*self.cfg.init_pose.orientation)),
+            "initPose" : airsim.Pose(airsim.Vector3r(*init_position), airsim.Quaternionr(*self.cfg.init_pose.orientation)),
             "curPose": None,
         }
 
         # color map
-        self.color_map = []
-        with open(self.cfg.color_file, "r") as f:
-            lines = f.read()
-            pattern = re.compile(r"\d+\t\[(\d+), (\d+), (\d+)\]")
-            for match in pattern.findall(lines):
-                color = [int(i) for i in match]
-                self.color_map.append(color[::-1])
+        self.color_map = load_color_map(self.cfg.color_file)
 
         # supported actions
         self.supported_actions = [
@@ -68,30 +103,53 @@ class AirSimController():
             "hover",
             # get image
             "get_image",
+            "get_segmentation",
+            "capture_observation",
+            "get_segmentation_stats",
             # reset
             "reset"
             # others
             "get_position",
             "set_pose",
+            "wait_settled",
         ]
 
         # init
         self.setup()
 
+        # non-blocking action execution with handles
+        self.actions = AsyncAirSimController(self)
+
+    def make_client(self):
+        if self.cfg.airsim.backend == "airsim":
+            return airsim.MultirotorClient(ip=self.ip, port=self.port)
+        elif self.cfg.airsim.backend == "mock":
+            from tools.mock_airsim import MockMultirotorClient
+            return MockMultirotorClient(ip=self.ip, port=self.port, cfg=self.cfg)
+        else:
+            raise NotImplementedError(
+                f"AirSim backend {self.cfg.airsim.backend} is not supported yet."
+            )
+
     def setup(self) -> None:
         # connect to airsim server
-        self.client=airsim.MultirotorClient()
+        self.client=self.make_client()
         self.client.confirmConnection()
-        self.client.enableApiControl(True)
-        self.client.armDisarm(True)
-        self.client.takeoffAsync().join()
-        self.client.hoverAsync().join()
-        self.logger.info(f"AirSim Controller: Connected to server")
+        self.client.enableApiControl(True, vehicle_name=self.vehicle_name)
+        self.client.armDisarm(True, vehicle_name=self.vehicle_name)
+        self.client.takeoffAsync(vehicle_name=self.vehicle_name).join()
+        self.client.hoverAsync(vehicle_name=self.vehicle_name).join()
+        # separate connection for images and pose queries, so that they can
+        # be served while a maneuver is blocking self.client; shared by the
+        # sensor worker, the step thread, the servers and cancel_last_task
+        self.sensor_client=LockedClient(self.make_client())
+        self.sensor_client.confirmConnection()
+        self.logger.info(f"AirSim Controller: Connected to server {self.ip or 'localhost'}:{self.port} as vehicle '{self.vehicle_name}'")
 
 
         # set init pose
-        self.client.simSetVehiclePose(self.status["initPose"], True)
-        self.status["curPose"] = self.client.simGetVehiclePose()
+        self.client.simSetVehiclePose(self.status["initPose"], True, vehicle_name=self.vehicle_name)
+        self.status["curPose"] = self.client.simGetVehiclePose(vehicle_name=self.vehicle_name)
         self.logger.info(f"AirSim Controller: Init pose set to {self.status['initPose']}")
 
         # set ship id
@@ -103,10 +161,9 @@ class AirSimController():
         
     def isShipInView(self) -> bool:
         ship_color = self.color_map[self.cfg.ship_id]
-        view = self.client.simGetImages([airsim.ImageRequest(0, airsim.ImageType.Segmentation, False, False)])[0]
-        view_np = np.frombuffer(view.image_data_uint8, dtype=np.uint8).reshape(view.height, view.width, 3)
-        mask = np.all(view_np == ship_color, axis=-1)
-        pixels_num = np.sum(mask).item()
+        view = self.sensor_client.simGetImages([airsim.ImageRequest(0, airsim.ImageType.Segmentation, False, False)], vehicle_name=self.vehicle_name)[0]
+        keys = pack_rgb(view.image_data_uint8, view.height, view.width)
+        pixels_num = np.count_nonzero(object_mask(keys, ship_color))
         return pixels_num > self.cfg.task.ship_visible_threshold * view.height * view.width
     
     def fly_to(self,
@@ -114,24 +171,26 @@ class AirSimController():
         y:int,
         z:int,
     ):
-        cur_position = self.client.simGetVehiclePose().position
+        cur_position = self.client.simGetVehiclePose(vehicle_name=self.vehicle_name).position
         cur_x,cur_y,cur_z = cur_position.x_val,cur_position.y_val,cur_position.z_val
 
-        self.client.moveToPositionAsync(cur_x,cur_y,self.cfg.control.cruise_altitude,self.cfg.control.cruise_velocity).join()
-        self.client.moveToPositionAsync(x,y,self.cfg.control.cruise_altitude,self.cfg.control.cruise_velocity).join()
-        self.client.moveToZAsync(z,self.cfg.control.cruise_velocity).join()
+        self.client.moveToPositionAsync(cur_x,cur_y,self.cfg.control.cruise_altitude,self.cfg.control.cruise_velocity, vehicle_name=self.vehicle_name).join()
+        self.client.moveToPositionAsync(x,y,self.cfg.control.cruise_altitude,self.cfg.control.cruise_velocity, vehicle_name=self.vehicle_name).join()
+        self.client.moveToZAsync(z,self.cfg.control.cruise_velocity, vehicle_name=self.vehicle_name).join()
         # self.client.hoverAsync().join()
-        self.client.moveByVelocityAsync(0, 0, 0, 1).join()
+        self.client.moveByVelocityAsync(0, 0, 0, 1, vehicle_name=self.vehicle_name).join()
 
     def set_pose(self, position:tuple=None, quaternion:tuple=None):
-        pose=self.client.simGetVehiclePose()
+        pose=self.client.simGetVehiclePose(vehicle_name=self.vehicle_name)
         if position is None:
             position = (pose.position.x_val, pose.position.y_val, pose.position.z_val)
         if quaternion is None:
             quaternion = (pose.orientation.x_val, pose.orientation.y_val, pose.orientation.z_val, pose.orientation.w_val)
-        self.client.simSetVehiclePose(airsim.Pose(airsim.Vector3r(*position), airsim.Quaternionr(*quaternion)), True)
+        # task files give unnormalized quaternions such as (0, 0, 1, 1)
+        quaternion = (np.asarray(quaternion, dtype=float) / np.linalg.norm(quaternion)).tolist()
+        self.client.simSetVehiclePose(airsim.Pose(airsim.Vector3r(*position), airsim.Quaternionr(*quaternion)), True, vehicle_name=self.vehicle_name)
 
-        self.client.moveByVelocityAsync(0,0,0,1).join()
+        self.client.moveByVelocityAsync(0,0,0,1, vehicle_name=self.vehicle_name).join()
 
     def set_position(
         self,
@@ -139,47 +198,169 @@ class AirSimController():
         y:int,
         z:int,
     ):
-        self.client.simSetVehiclePose(airsim.Pose(airsim.Vector3r(x, y, z), airsim.to_quaternion(0, 0, 0)), True)
-        self.client.moveByVelocityAsync(0, 0, 0, 1).join()
+        self.client.simSetVehiclePose(airsim.Pose(airsim.Vector3r(x, y, z), airsim.to_quaternion(0, 0, 0)), True, vehicle_name=self.vehicle_name)
+        self.client.moveByVelocityAsync(0, 0, 0, 1, vehicle_name=self.vehicle_name).join()
         # self.client.hoverAsync().join()
-        self.status["curPose"] = self.client.simGetVehiclePose()
+        self.status["curPose"] = self.client.simGetVehiclePose(vehicle_name=self.vehicle_name)
 
         
-    def get_image(self) -> str:
+    def next_frame_id(self, episode_id:str=None, step:int=None) -> str:
+        episode_id = episode_id or self.session_id
+        step = step or 0
+        return f"{episode_id}_{step:04d}_{next(FRAME_COUNTER):06d}"
+
+    def get_image(self, frame_id:str=None, view:str=None) -> str:
+        frame_id = frame_id or self.next_frame_id()
+        # view selects a camera other than the current one without switching to it
+        view = view or self.cur_view
+        camera_id = 0 if view == FRONT else 3
+        view = self.sensor_client.simGetImages([self.scene_request(camera_id)], vehicle_name=self.vehicle_name)[0]
+
+        return self.save_image(view, frame_id)
+
+    def get_segmentation(self, frame_id:str=None) -> str:
+        frame_id = frame_id or self.next_frame_id()
         camera_id = 0 if self.cur_view == FRONT else 3
-        image = self.client.simGetImage(camera_id,airsim.ImageType.Scene)
 
-        img = cv2.imdecode(airsim.string_to_uint8_array(image), cv2.IMREAD_COLOR)
-        os.makedirs(os.path.join(self.cfg.cache,"images"),exist_ok=True)
-        img_path = os.path.join(self.cfg.cache,"images",f"{time.strftime('%Y%m%d%H%M%S')}.png")
-        cv2.imwrite(img_path,img)
+        view = self.sensor_client.simGetImages([airsim.ImageRequest(camera_id, airsim.ImageType.Segmentation, False, False)], vehicle_name=self.vehicle_name)[0]
 
-        return img_path
+        return self.save_segmentation(view, frame_id)
 
-    def get_segmentation(self) -> str:
+    def get_segmentation_stats(self,
+        object_ids:list=None,
+        center_size:int=None,
+        save_mask:bool=False,
+        frame_id:str=None,
+    ) -> dict:
+        frame_id = frame_id or self.next_frame_id()
         camera_id = 0 if self.cur_view == FRONT else 3
-        ship_color = self.color_map[self.cfg.ship_id]
 
-        view = self.client.simGetImages([airsim.ImageRequest(camera_id, airsim.ImageType.Segmentation, False, False)])[0]
-        view_np = np.frombuffer(view.image_data_uint8, dtype=np.uint8).reshape(view.height, view.width, 3)
-        mask = np.all(view_np == ship_color, axis=-1)
+        view = self.sensor_client.simGetImages([airsim.ImageRequest(camera_id, airsim.ImageType.Segmentation, False, False)], vehicle_name=self.vehicle_name)[0]
+
+        result = {"frame_id": frame_id}
+        result.update(self.segmentation_stats(view, frame_id, object_ids, center_size, save_mask))
+        return result
+
+    def capture_observation(self,
+        scene:bool=True,
+        segmentation:bool=True,
+        depth:bool=False,
+        frame_id:str=None,
+        seg_stats:bool=False,
+        object_ids:list=None,
+        center_size:int=None,
+        save_mask:bool=False,
+    ) -> dict:
+        frame_id = frame_id or self.next_frame_id()
+        # fetch all requested image types of the current view in a single RPC
+        camera_id = 0 if self.cur_view == FRONT else 3
+        image_types = []
+        image_requests = []
+        if scene:
+            image_types.append("scene")
+            image_requests.append(self.scene_request(camera_id))
+        if segmentation:
+            image_types.append("segmentation")
+            image_requests.append(airsim.ImageRequest(camera_id, airsim.ImageType.Segmentation, False, False))
+        if depth:
+            image_types.append("depth")
+            image_requests.append(airsim.ImageRequest(camera_id, airsim.ImageType.DepthPerspective, True, False))
+        if not image_requests:
+            return {}
+
+        views = self.sensor_client.simGetImages(image_requests, vehicle_name=self.vehicle_name)
+
+        observation = {"frame_id": frame_id}
+        for image_type, view in zip(image_types, views):
+            if image_type == "scene":
+                observation["image_path"] = self.save_image(view, frame_id)
+            elif image_type == "segmentation" and seg_stats:
+                observation.update(self.segmentation_stats(view, frame_id, object_ids, center_size, save_mask))
+            elif image_type == "segmentation":
+                observation["seg_mask"] = self.save_segmentation(view, frame_id)
+            elif image_type == "depth":
+                observation["depth_path"] = self.save_depth(view, frame_id)
+        return observation
+
+    def scene_request(self, camera_id:int) -> airsim.ImageRequest:
+        if self.cfg.capture.format == "png":
+            # AirSim already compresses to png, the bytes are passed through as is
+            return airsim.ImageRequest(camera_id, airsim.ImageType.Scene)
+        # other formats are encoded once from the uncompressed frame
+        return airsim.ImageRequest(camera_id, airsim.ImageType.Scene, False, False)
+
+    def encode_image(self, view) -> bytes:
+        fmt = self.cfg.capture.format
+        if fmt == "png":
+            return bytes(view.image_data_uint8)
+
+        img = np.frombuffer(view.image_data_uint8, dtype=np.uint8).reshape(view.height, view.width, 3)
+        if fmt == "jpg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.cfg.capture.quality]
+        elif fmt == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.cfg.capture.quality]
+        else:
+            raise NotImplementedError(f"Image format {fmt} is not supported yet.")
+        success, buf = cv2.imencode(f".{fmt}", img, params)
+        if not success:
+            raise Exception(f"Failed to encode image as {fmt}")
+        return buf.tobytes()
+
+    def save_image(self, view, frame_id:str) -> str:
+        data = self.encode_image(view)
 
-        mask = mask.astype(np.uint8)
+        img_path = os.path.join(self.cfg.cache,"images",f"{frame_id}.{self.cfg.capture.format}")
+
+        return frame_store.put(img_path, data)
+
+    def segmentation_stats(self,
+        view,
+        frame_id:str,
+        object_ids:list=None,
+        center_size:int=None,
+        save_mask:bool=False,
+    ) -> dict:
+        object_ids = object_ids or [self.cfg.ship_id]
+
+        keys = pack_rgb(view.image_data_uint8, view.height, view.width)
+        stats = object_stats(keys, self.color_map, object_ids, center_size)
+
+        # string keys so the reply is the same in-process and over HTTP
+        result = {"seg_stats": {str(object_id): info for object_id, info in stats.items()}}
+        if save_mask:
+            result["seg_mask"] = self.save_segmentation(view, frame_id, keys)
+        return result
+
+    def save_segmentation(self, view, frame_id:str, keys:np.ndarray=None) -> str:
+        ship_color = self.color_map[self.cfg.ship_id]
+
+        if keys is None:
+            keys = pack_rgb(view.image_data_uint8, view.height, view.width)
+        mask = object_mask(keys, ship_color).view(np.uint8)
 
         # save the mask
         os.makedirs(os.path.join(self.cfg.cache,"segmentation"),exist_ok=True)
-        mask_path = os.path.join(self.cfg.cache,"segmentation",f"{time.strftime('%Y%m%d%H%M%S')}.png")
+        mask_path = os.path.join(self.cfg.cache,"segmentation",f"{frame_id}_seg.png")
         cv2.imwrite(mask_path, mask * 255)
 
         return mask_path
 
+    def save_depth(self, view, frame_id:str) -> str:
+        depth = airsim.get_pfm_array(view)
+
+        os.makedirs(os.path.join(self.cfg.cache,"depth"),exist_ok=True)
+        depth_path = os.path.join(self.cfg.cache,"depth",f"{frame_id}_depth.pfm")
+        airsim.write_pfm(depth_path, depth)
+
+        return depth_path
+
     def move(self, action_name:str) -> None :
         if action_name == "move_up" or action_name == "move_down":
             if action_name == "move_up":
                 step_y = -self.cfg.control.step_dist
             else:
                 step_y = self.cfg.control.step_dist
-            self.client.moveByVelocityAsync(0,0,step_y,step_y,self.cfg.control.base_speed).join()
+            self.client.moveByVelocityAsync(0,0,step_y,step_y,self.cfg.control.base_speed, vehicle_name=self.vehicle_name).join()
             return
         elif action_name in [
             "move_forward",
@@ -191,7 +372,7 @@ class AirSimController():
             "move_downleft",
             "move_downright",
         ]:
-            pose = self.client.simGetVehiclePose()
+            pose = self.client.simGetVehiclePose(vehicle_name=self.vehicle_name)
             position = pose.position
             yaw = airsim.to_eularian_angles(pose.orientation)[2]
 
@@ -223,9 +404,9 @@ class AirSimController():
                 step_x = -dist*math.cos(yaw-math.pi/4)
                 step_y = -dist*math.sin(yaw-math.pi/4)
 
-            self.client.moveToPositionAsync(cur_x+step_x,cur_y+step_y,cur_z,self.cfg.control.base_speed).join()
+            self.client.moveToPositionAsync(cur_x+step_x,cur_y+step_y,cur_z,self.cfg.control.base_speed, vehicle_name=self.vehicle_name).join()
             # self.client.hoverAsync().join()
-            self.client.moveByVelocityAsync(0, 0, 0, 1).join()
+            self.client.moveByVelocityAsync(0, 0, 0, 1, vehicle_name=self.vehicle_name).join()
             return
 
         else:
@@ -240,14 +421,14 @@ class AirSimController():
         else:
             print(f"action_name {action_name} not supported")
             return
-        self.client.moveByVelocityBodyFrameAsync(0,0,0,yaw_rate,self.cfg.control.rotate_step).join()
+        self.client.moveByVelocityBodyFrameAsync(0,0,0,yaw_rate,self.cfg.control.rotate_step, vehicle_name=self.vehicle_name).join()
 
         # self.client.hoverAsync().join()
-        self.client.moveByVelocityAsync(0, 0, 0, 1).join()
+        self.client.moveByVelocityAsync(0, 0, 0, 1, vehicle_name=self.vehicle_name).join()
         return
 
     def land(self) -> None:
-        self.client.landAsync().join()
+        self.client.landAsync(vehicle_name=self.vehicle_name).join()
         return
 
     def switch_view(self):
@@ -259,13 +440,15 @@ class AirSimController():
 
     def spray_water(self) -> None:
         self.status["isSpraying"] = not self.status["isSpraying"]
+        # needs a display, so only imported when the simulator window is driven
+        import pyautogui
         screen,height = pyautogui.size()
         pyautogui.moveTo(screen/2,height/2,duration=1)
         pyautogui.click()
         pyautogui.press('P')
 
     def get_position_and_view(self) -> dict:
-        position = self.client.simGetVehiclePose().position
+        position = self.sensor_client.simGetVehiclePose(vehicle_name=self.vehicle_name).position
         return {
             "x":int(position.x_val),
             "y":int(position.y_val),
@@ -273,17 +456,57 @@ class AirSimController():
             "view":self.cur_view,
         }
 
+    def wait_until_settled(self, timeout:float=None) -> dict:
+        # poll the kinematics until the drone is stable instead of sleeping a fixed time
+        if timeout is None:
+            timeout = self.cfg.control.settle_timeout
+        start = time.time()
+        while True:
+            kinematics = self.sensor_client.getMultirotorState(vehicle_name=self.vehicle_name).kinematics_estimated
+            speed = kinematics.linear_velocity.get_length()
+            angular_rate = kinematics.angular_velocity.get_length()
+            settled = speed < self.cfg.control.settle_velocity and angular_rate < self.cfg.control.settle_angular_rate
+            waited = time.time() - start
+            if settled or waited >= timeout:
+                break
+            time.sleep(self.cfg.control.settle_interval)
+        return {"settled": settled, "waited": waited}
+
+    def cancel_last_task(self) -> None:
+        # issued on the sensor connection, self.client is blocked by the maneuver
+        self.sensor_client.cancelLastTask(vehicle_name=self.vehicle_name)
+
     def reset(self) -> None:
-        self.client.simSetVehiclePose(self.status["init_pose"], True)
-        self.client.moveByVelocityAsync(0,0,0,1).join()
+        self.client.simSetVehiclePose(self.status["init_pose"], True, vehicle_name=self.vehicle_name)
+        self.client.moveByVelocityAsync(0,0,0,1, vehicle_name=self.vehicle_name).join()
         self.cur_view = self.cfg.view
         self.status["isSpraying"] = False
         return
 
     
 
+    def frame_id_of(self, action) -> str:
+        # captures made during an episode carry its id and the current step
+        return self.next_frame_id(
+            action["action_params"].get("episode_id", None),
+            action["action_params"].get("step", None),
+        )
+
     def exec_action(self, action) -> dict :
-        self.logger.info(f"AirSim Controller: exec action {action["action_name"]} with params {action['action_params']}")
+        action_name = action["action_name"]
+        status = "error"
+        start = time.perf_counter()
+        try:
+            with tracer.span("exec_action", action_name=action_name, vehicle_name=self.vehicle_name):
+                result = self.run_action(action)
+            status = "success"
+            return result
+        finally:
+            ACTION_REQUESTS.inc(action_name=action_name, status=status)
+            ACTION_LATENCY.observe(time.perf_counter() - start, action_name=action_name)
+
+    def run_action(self, action) -> dict :
+        self.logger.info(f"AirSim Controller: exec action {action['action_name']} with params {action['action_params']}")
         if "move" in action["action_name"]:
             self.move(action["action_name"])
             return None
@@ -293,8 +516,9 @@ class AirSimController():
             self.set_pose(position, quaternion)
             return None
         elif action["action_name"] == "get_segmentation":
-            mask_path = self.get_segmentation()
-            return {"seg_mask": mask_path}
+            frame_id = self.frame_id_of(action)
+            mask_path = self.get_segmentation(frame_id)
+            return {"seg_mask": mask_path, "frame_id": frame_id}
         elif "turn" in action["action_name"]:
             self.turn(action["action_name"])
             return None
@@ -305,8 +529,27 @@ class AirSimController():
             self.switch_view()
             return None
         elif action["action_name"] == "get_image":
-            image_path = self.get_image()
-            return {"image_path":image_path}
+            frame_id = self.frame_id_of(action)
+            image_path = self.get_image(frame_id, action["action_params"].get("view", None))
+            return {"image_path":image_path, "frame_id":frame_id}
+        elif action["action_name"] == "capture_observation":
+            return self.capture_observation(
+                scene=action["action_params"].get("scene", True),
+                segmentation=action["action_params"].get("segmentation", True),
+                depth=action["action_params"].get("depth", False),
+                frame_id=self.frame_id_of(action),
+                seg_stats=action["action_params"].get("seg_stats", False),
+                object_ids=action["action_params"].get("object_ids", None),
+                center_size=action["action_params"].get("center_size", None),
+                save_mask=action["action_params"].get("save_mask", False),
+            )
+        elif action["action_name"] == "get_segmentation_stats":
+            return self.get_segmentation_stats(
+                object_ids=action["action_params"].get("object_ids", None),
+                center_size=action["action_params"].get("center_size", None),
+                save_mask=action["action_params"].get("save_mask", False),
+                frame_id=self.frame_id_of(action),
+            )
         elif action["action_name"] == "reset":
             self.reset()
         elif action["action_name"] == "spray_water":
@@ -316,10 +559,12 @@ class AirSimController():
         elif action["action_name"] == "get_position_and_view":
             info = self.get_position_and_view()
             return info
+        elif action["action_name"] == "wait_settled":
+            return self.wait_until_settled(action["action_params"].get("timeout", None))
         elif action["action_name"] == "fly_to":
             x,y = action["action_params"]["x"], action["action_params"]["y"]
             z = action["action_params"]["z"] if "z" in action["action_params"] else self.cfg.init_pose.position[2]
-            self.client.moveToPositionAsync(x,y,z,self.cfg.control.base_speed).join()
+            self.client.moveToPositionAsync(x,y,z,self.cfg.control.base_speed, vehicle_name=self.vehicle_name).join()
             return None
         elif action["action_name"] == "set_position":
             x,y,z = action["action_params"]["x"], action["action_params"]["y"], action["action_params"]["z"]
@@ -329,24 +574,122 @@ class AirSimController():
             print(f"action_name {action['action_name']} not supported")
             return None
 
-    def start_server(self):
-        app = Flask(__name__)
+    def exec_batch(self, actions:list) -> list:
+        # run the actions in order and reply with one result per action
+        results = []
+        for action in actions:
+            result = self.exec_action(action)
+            results.append(result if result else {"status": "success"})
+        return results
+
+    def start_server(self, port:int=None):
+        app = create_control_app(self)
+        app.run(host='0.0.0.0', port=port or self.cfg.server.airsim_port)
+
+
+class VehicleRouter():
+    """Serves several vehicles of one simulator from a single control server,
+    dispatching every action to the controller named by its vehicle_name."""
+    def __init__(self, controllers:list) -> None:
+        self.controllers = {controller.vehicle_name: controller for controller in controllers}
+        self.default = controllers[0]
+        self.cfg = self.default.cfg
+        self.actions = self
+
+    def route(self, action) -> AirSimController:
+        vehicle_name = action.get("vehicle_name", None)
+        if not vehicle_name:
+            return self.default
+        if vehicle_name not in self.controllers:
+            raise ValueError(f"Unknown vehicle: {vehicle_name}")
+        return self.controllers[vehicle_name]
+
+    def exec_action(self, action) -> dict:
+        return self.route(action).exec_action(action)
+
+    def exec_batch(self, actions:list) -> list:
+        results = []
+        for action in actions:
+            result = self.exec_action(action)
+            results.append(result if result else {"status": "success"})
+        return results
+
+    def submit(self, action):
+        return self.route(action).actions.submit(action)
 
+    def get(self, action_id:str):
+        # action ids are unique across controllers
+        for controller in self.controllers.values():
+            handle = controller.actions.get(action_id)
+            if handle is not None:
+                return handle
+        return None
 
-        @app.route('/test',methods=['GET','POST'])
-        def test():
-            return jsonify({'status': 'success'})
+    def start_server(self, port:int=None):
+        app = create_control_app(self)
+        app.run(host='0.0.0.0', port=port or self.cfg.server.airsim_port)
 
 
-        @app.route('/control', methods=['POST'])
-        def control():
-            action = request.get_json()
-            result = self.exec_action(action)
-            if result:
-                return jsonify(result)
-            return jsonify({'status': 'success'})
-        
-        app.run(host='0.0.0.0', port=self.cfg.server.airsim_port)
+def create_control_app(controller) -> Flask:
+    app = Flask(__name__)
+
+
+    @app.route('/test',methods=['GET','POST'])
+    def test():
+        return jsonify({'status': 'success'})
+
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+    @app.route('/control', methods=['POST'])
+    def control():
+        action = request.get_json()
+        # continue the caller's trace, if it sent one
+        with tracer.span("control", parent=tracer.extract(request.headers), action_name=action["action_name"]):
+            result = controller.exec_action(action)
+        if result:
+            return jsonify(result)
+        return jsonify({'status': 'success'})
+
+
+    @app.route('/control/batch', methods=['POST'])
+    def control_batch():
+        actions = request.get_json()["actions"]
+        with tracer.span("control_batch", parent=tracer.extract(request.headers), actions=len(actions)):
+            results = controller.exec_batch(actions)
+        return jsonify({'results': results})
+
+
+    @app.route('/actions', methods=['POST'])
+    def submit_action():
+        action = request.get_json()
+        with tracer.span("submit_action", parent=tracer.extract(request.headers), action_name=action["action_name"]):
+            handle = controller.actions.submit(action)
+        return jsonify(handle.to_dict())
+
+
+    @app.route('/actions/<action_id>', methods=['GET'])
+    def action_status(action_id):
+        handle = controller.actions.get(action_id)
+        if handle is None:
+            return jsonify({'status': 'unknown', 'action_id': action_id}), 404
+        # optional long polling: ?wait=<seconds>
+        handle.wait(request.args.get('wait', 0, type=float))
+        return jsonify(handle.to_dict())
+
+
+    @app.route('/actions/<action_id>', methods=['DELETE'])
+    def cancel_action(action_id):
+        handle = controller.actions.get(action_id)
+        if handle is None:
+            return jsonify({'status': 'unknown', 'action_id': action_id}), 404
+        handle.cancel()
+        return jsonify(handle.to_dict())
+
+    return app
 
 
 if __name__ == "__main__":
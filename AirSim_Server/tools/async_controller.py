@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError
+
+# shared by all controllers so that one server can look handles up by id alone
+ACTION_IDS = itertools.count(1)
+
+# actions that move the drone and block until the maneuver is over
+MOTION_ACTIONS = ("move", "turn", "fly_to", "set_pose", "set_position", "land", "reset")
+
+
+def is_motion(action_name:str) -> bool:
+    return any(name in action_name for name in MOTION_ACTIONS)
+
+
+class LockedClient:
+    """Serializes the calls of the threads sharing one RPC client; an
+    msgpack-rpc connection must not carry two requests at once."""
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+class ActionHandle:
+    """Returned as soon as an action is submitted; await it, poll its status
+    or cancel it while the action runs in the background."""
+    def __init__(self, action_id:str, action:dict, future, canceller=None):
+        self.action_id = action_id
+        self.action = action
+        self.future = future
+        self.canceller = canceller
+        self.cancel_requested = False
+
+    @property
+    def status(self) -> str:
+        if self.future.cancelled() or (self.cancel_requested and self.future.done()):
+            return "cancelled"
+        if self.future.done():
+            return "failed" if self.future.exception() else "done"
+        if self.future.running():
+            return "running"
+        return "pending"
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, timeout:float=None) -> bool:
+        try:
+            self.future.exception(timeout=timeout)
+        except (TimeoutError, CancelledError):
+            pass
+        return self.future.done()
+
+    def result(self, timeout:float=None) -> dict:
+        result = self.future.result(timeout=timeout)
+        return result if result else {"status": "success"}
+
+    def cancel(self) -> bool:
+        # still queued: drop it, otherwise stop the running maneuver
+        if self.future.cancel():
+            return True
+        if self.future.done():
+            return False
+        self.cancel_requested = True
+        if self.canceller:
+            self.canceller()
+        return True
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def to_dict(self) -> dict:
+        info = {
+            "action_id": self.action_id,
+            "action_name": self.action["action_name"],
+            "status": self.status,
+        }
+        if info["status"] == "done":
+            info["result"] = self.result()
+        elif info["status"] == "failed":
+            info["error"] = str(self.future.exception())
+        return info
+
+
+class AsyncAirSimController:
+    """Non-blocking front end of AirSimController.
+
+    Maneuvers run one after another on the motion worker, while observations
+    (images, pose, view switching) run on a second worker that uses the
+    controller's sensor connection, so they can overlap a maneuver.
+    """
+    def __init__(self, controller, max_handles:int=256):
+        self.controller = controller
+        self.max_handles = max_handles
+        self.motion_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="airsim-motion")
+        self.sensor_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="airsim-sensor")
+        self.handles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, action:dict) -> ActionHandle:
+        action.setdefault("action_params", {})
+        # run in the caller's context so that the action's span joins its step
+        context = contextvars.copy_context()
+        if is_motion(action["action_name"]):
+            future = self.motion_executor.submit(context.run, self.controller.exec_action, action)
+            canceller = self.controller.cancel_last_task
+        else:
+            future = self.sensor_executor.submit(context.run, self.controller.exec_action, action)
+            canceller = None
+
+        handle = ActionHandle(str(next(ACTION_IDS)), action, future, canceller)
+        with self.lock:
+            self.handles[handle.action_id] = handle
+            # forget the oldest finished actions
+            while len(self.handles) > self.max_handles:
+                oldest = next(iter(self.handles.values()))
+                if not oldest.done():
+                    break
+                self.handles.popitem(last=False)
+        return handle
+
+    async def execute(self, action:dict) -> dict:
+        handle = self.submit(action)
+        await handle
+        return handle.result()
+
+    def get(self, action_id:str) -> ActionHandle:
+        with self.lock:
+            return self.handles.get(action_id, None)
+
+    def cancel(self, action_id:str) -> bool:
+        handle = self.get(action_id)
+        if handle is None:
+            return False
+        return handle.cancel()
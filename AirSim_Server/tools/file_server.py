@@ -1,10 +1,25 @@
 import flask
 import logging
+import io
 import os
 import sys
+from mimetypes import guess_type
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from configs import *
+from tools.frame_store import frame_store
+from tools.metrics import registry, CONTENT_TYPE
+
+FILE_REQUESTS = registry.counter(
+    "bedi_file_requests_total",
+    "Files requested from the file server by source (memory, disk, missing)",
+    ("source",)
+)
+IMAGE_BYTES = registry.counter(
+    "bedi_file_served_bytes_total",
+    "Image bytes served by the file server by source (memory, disk)",
+    ("source",)
+)
 
 def start_file_server(logger:logging.Logger):
     cfg = get_default_config()
@@ -19,12 +34,29 @@ def start_file_server(logger:logging.Logger):
     @app.route('/file/<path:filename>', methods=['GET'])
     def get_file(filename):
         logger.info(f"FileServer: Request file: {filename}")
-        return flask.send_from_directory(ROOT, filename)
+        data = frame_store.get(filename)
+        if data is not None:
+            FILE_REQUESTS.inc(source="memory")
+            IMAGE_BYTES.inc(len(data), source="memory")
+            mime_type, _ = guess_type(filename)
+            return flask.send_file(io.BytesIO(data), mimetype=mime_type)
+        try:
+            response = flask.send_from_directory(ROOT, filename)
+        except Exception:
+            FILE_REQUESTS.inc(source="missing")
+            raise
+        FILE_REQUESTS.inc(source="disk")
+        IMAGE_BYTES.inc(response.content_length or 0, source="disk")
+        return response
 
     @app.route('/test', methods=['GET'])
     def test():
         return "test"
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return flask.Response(registry.render(), content_type=CONTENT_TYPE)
+
 
     app.run(host='0.0.0.0', port=cfg.server.file_port)
 
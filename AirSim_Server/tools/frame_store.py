@@ -0,0 +1,183 @@
+import base64
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from tools.metrics import registry
+
+
+class FrameStore:
+    """Bounded in-memory store of encoded frames, shared by the controller,
+    the agents, draw_box and the file server.
+
+    Frames are keyed by their file name (frame id), so the paths handed around
+    between components keep working both as store keys and as disk fallbacks.
+    The base64 payloads sent to the models are cached under the same keys, so
+    a frame sent to several prompts, retries or models is encoded once.
+
+    ``spill`` keeps an asynchronous disk copy for auditing only; with
+    ``shared`` the frames are read by another process (the HTTP transport)
+    and are written to disk before ``put`` returns.
+    """
+    def __init__(self,
+                 enabled: bool = True,
+                 max_frames: int = 64,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 spill: bool = False,
+                 max_encoded_bytes: int = 64 * 1024 * 1024,
+                 shared: bool = False):
+        self.lock = threading.Lock()
+        self.frames = OrderedDict()
+        self.nbytes = 0
+        self.encoded = OrderedDict()
+        self.encoded_nbytes = 0
+        self.spill_executor = None
+        # (cache, result) -> lookups, exported as metrics
+        self.lookups = {(cache, result): 0 for cache in ("frames", "encoded") for result in ("hit", "miss")}
+        self.configure(enabled, max_frames, max_bytes, spill, max_encoded_bytes, shared)
+
+    def configure(self,
+                  enabled: bool = True,
+                  max_frames: int = 64,
+                  max_bytes: int = 256 * 1024 * 1024,
+                  spill: bool = False,
+                  max_encoded_bytes: int = 64 * 1024 * 1024,
+                  shared: bool = False):
+        with self.lock:
+            self.enabled = enabled
+            self.max_frames = max_frames
+            self.max_bytes = max_bytes
+            self.spill = spill
+            self.max_encoded_bytes = max_encoded_bytes
+            self.shared = shared
+            if spill and self.spill_executor is None:
+                self.spill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-spill")
+            self._evict()
+
+    @staticmethod
+    def key(ref: str) -> str:
+        return os.path.basename(ref)
+
+    def put(self, path: str, data: bytes) -> str:
+        key = self.key(path)
+        with self.lock:
+            # the cached payloads belong to the old content
+            for encoded_key in [k for k in self.encoded if k[0] == key]:
+                self._drop_encoded(encoded_key)
+
+        if not self.enabled:
+            self._write(path, data)
+            return path
+
+        with self.lock:
+            if key in self.frames:
+                self.nbytes -= len(self.frames.pop(key))
+            self.frames[key] = data
+            self.nbytes += len(data)
+            self._evict()
+
+        if self.shared:
+            # the reader in the other process opens the path as soon as it gets it
+            self._write(path, data)
+        elif self.spill:
+            # keep a copy on disk for auditing without blocking the caller
+            self.spill_executor.submit(self._write, path, data)
+        return path
+
+    def get(self, ref: str) -> bytes:
+        key = self.key(ref)
+        with self.lock:
+            data = self.frames.get(key, None)
+            if data is not None:
+                self.frames.move_to_end(key)
+            self.lookups["frames", "miss" if data is None else "hit"] += 1
+            return data
+
+    def read(self, ref: str) -> bytes:
+        data = self.get(ref)
+        if data is None:
+            # evicted, spilled or never stored
+            with open(ref, "rb") as f:
+                data = f.read()
+        return data
+
+    def b64encode(self, ref: str, policy: tuple = None) -> str:
+        """Base64 payload of a frame, encoded on first use.
+
+        ``policy`` is the agent's ``(max_side, format, quality)``; the frame is
+        downscaled/re-encoded accordingly and cached per policy.
+        """
+        key = (self.key(ref), policy)
+        with self.lock:
+            payload = self.encoded.get(key, None)
+            self.lookups["encoded", "miss" if payload is None else "hit"] += 1
+            if payload is not None:
+                self.encoded.move_to_end(key)
+                return payload
+
+        data = self.read(ref)
+        if policy:
+            from tools.utils import encode_for_model
+            data = encode_for_model(data, *policy)
+        payload = base64.b64encode(data).decode("utf-8")
+        with self.lock:
+            self._drop_encoded(key)
+            self.encoded[key] = payload
+            self.encoded_nbytes += len(payload)
+            self._evict()
+        return payload
+
+    def _drop_encoded(self, key: str):
+        if key in self.encoded:
+            self.encoded_nbytes -= len(self.encoded.pop(key))
+
+    def _evict(self):
+        while self.frames and (len(self.frames) > self.max_frames or self.nbytes > self.max_bytes):
+            _, data = self.frames.popitem(last=False)
+            self.nbytes -= len(data)
+        while self.encoded and self.encoded_nbytes > self.max_encoded_bytes:
+            _, payload = self.encoded.popitem(last=False)
+            self.encoded_nbytes -= len(payload)
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+# shared by every component running in this process
+frame_store = FrameStore()
+
+registry.callback(
+    "bedi_frame_store_lookups_total",
+    "Frame store lookups by cache (frames, encoded payloads) and result (hit, miss)",
+    lambda: dict(frame_store.lookups),
+    type="counter",
+    labelnames=("cache", "result"),
+)
+registry.callback(
+    "bedi_frame_store_bytes",
+    "Bytes held by the frame store by cache",
+    lambda: {("frames",): frame_store.nbytes, ("encoded",): frame_store.encoded_nbytes},
+    labelnames=("cache",),
+)
+registry.callback(
+    "bedi_frame_store_entries",
+    "Entries held by the frame store by cache",
+    lambda: {("frames",): len(frame_store.frames), ("encoded",): len(frame_store.encoded)},
+    labelnames=("cache",),
+)
+
+
+def configure_frame_store(cfg):
+    frame_store.configure(
+        enabled=cfg.frame_store.enabled,
+        max_frames=cfg.frame_store.max_frames,
+        max_bytes=cfg.frame_store.max_bytes,
+        spill=cfg.frame_store.spill,
+        max_encoded_bytes=cfg.frame_store.max_encoded_bytes,
+        # actions and frame paths then cross to the episode process over HTTP
+        shared=cfg.server.transport == "http",
+    )
@@ -0,0 +1,46 @@
+import importlib.util
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# shared by every agent in the process, keyed by their pool settings
+SESSIONS = {}
+HTTP_CLIENTS = {}
+LOCK = threading.Lock()
+
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """Keep-alive requests session for agents that post JSON themselves
+    (e.g. Ollama), so consecutive calls reuse the open connections."""
+    with LOCK:
+        if pool_size not in SESSIONS:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            SESSIONS[pool_size] = session
+        return SESSIONS[pool_size]
+
+
+def get_http_client(pool_size: int = 10, timeout: float = None, http2: bool = True):
+    """httpx client handed to the OpenAI compatible agents.
+
+    HTTP/2 needs the optional h2 package; without it the client falls back
+    to pooled HTTP/1.1 connections.
+    """
+    import httpx
+
+    http2 = http2 and importlib.util.find_spec("h2") is not None
+    key = (pool_size, timeout, http2)
+    with LOCK:
+        if key not in HTTP_CLIENTS:
+            HTTP_CLIENTS[key] = httpx.Client(
+                http2=http2,
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size
+                )
+            )
+        return HTTP_CLIENTS[key]
@@ -0,0 +1,167 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(labels:dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def format_value(value:float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name:str, help:str, labelnames:tuple=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def key(self, labels:dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list:
+        # (suffix, labels, value)
+        with self.lock:
+            return [("", dict(zip(self.labelnames, key)), value) for key, value in self.values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, value:float=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value:float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, value:float=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name:str, help:str, labelnames:tuple=(), buckets:tuple=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value:float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            if key not in self.values:
+                # per-bucket counts, sum
+                self.values[key] = [[0] * len(self.buckets), 0.0]
+            counts, _ = self.values[key]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key][1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        samples = []
+        with self.lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": format_value(bound)}, cumulative))
+            samples.append(("_count", labels, cumulative))
+            samples.append(("_sum", labels, total))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """Value read when scraped, for state owned by another component (queue
+    sizes, cache statistics). ``func`` returns a number, or a dict mapping
+    label value tuples to numbers."""
+    def __init__(self, name:str, help:str, func, type:str="gauge", labelnames:tuple=()):
+        super().__init__(name, help, labelnames)
+        self.func = func
+        self.type = type
+
+    def samples(self) -> list:
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [("", dict(zip(self.labelnames, key)), value) for key, value in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def register(self, metric:Metric) -> Metric:
+        with self.lock:
+            existing = self.metrics.get(metric.name, None)
+            # module level metrics survive reimports; callbacks follow their latest owner
+            if existing is not None and not isinstance(metric, CallbackMetric):
+                return existing
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name:str, help:str, labelnames:tuple=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name:str, help:str, labelnames:tuple=()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name:str, help:str, labelnames:tuple=(), buckets:tuple=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name:str, help:str, func, type:str="gauge", labelnames:tuple=()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, func, type, labelnames))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# shared by the control server, the file server and TaskHelper of this process
+registry = Registry()
@@ -0,0 +1,327 @@
+import math
+import re
+import threading
+import time
+
+import airsim
+import cv2
+import numpy as np
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.segmentation import load_color_map
+
+# clients created for the same ip:port share one world, like AirSim
+WORLDS = {}
+WORLDS_LOCK = threading.Lock()
+
+FRONT_CAMERAS = ("0", "front_center", "")
+BOTTOM_CAMERAS = ("3", "bottom_center")
+
+
+class MockManeuver:
+    """Linear motion from one pose to another, played back in scaled time."""
+    def __init__(self, start:np.ndarray, end:np.ndarray, start_yaw:float, end_yaw:float, duration:float, time_scale:float):
+        self.start = start
+        self.end = end
+        self.start_yaw = start_yaw
+        self.end_yaw = end_yaw
+        # simulated seconds, used for the reported velocities
+        self.duration = max(duration, 0.0)
+        self.t0 = time.time()
+        self.t1 = self.t0 + self.duration * time_scale
+        self.finished = threading.Event()
+
+    def progress(self, now:float) -> float:
+        if self.finished.is_set() or now >= self.t1:
+            return 1.0
+        return (now - self.t0) / (self.t1 - self.t0)
+
+    def pose(self, now:float) -> tuple:
+        p = self.progress(now)
+        return self.start + (self.end - self.start) * p, self.start_yaw + (self.end_yaw - self.start_yaw) * p
+
+    def velocity(self, now:float) -> tuple:
+        if self.progress(now) >= 1.0 or self.duration == 0:
+            return np.zeros(3), 0.0
+        return (self.end - self.start) / self.duration, (self.end_yaw - self.start_yaw) / self.duration
+
+    def stop(self, now:float):
+        # freeze where the vehicle is now
+        self.end, self.end_yaw = self.pose(now)
+        self.t1 = now
+        self.finished.set()
+
+
+class MockFuture:
+    def __init__(self, maneuver:MockManeuver = None):
+        self.maneuver = maneuver
+
+    def join(self):
+        if self.maneuver is not None:
+            self.maneuver.finished.wait(max(self.maneuver.t1 - time.time(), 0))
+
+
+class MockVehicle:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.position = np.zeros(3)
+        self.yaw = 0.0
+        self.maneuver = None
+
+    def pose(self, now:float) -> tuple:
+        with self.lock:
+            if self.maneuver is None:
+                return self.position.copy(), self.yaw
+            return self.maneuver.pose(now)
+
+    def velocity(self, now:float) -> tuple:
+        with self.lock:
+            if self.maneuver is None:
+                return np.zeros(3), 0.0
+            return self.maneuver.velocity(now)
+
+    def stop(self):
+        # like AirSim, a new command cancels the running one
+        with self.lock:
+            if self.maneuver is not None:
+                self.maneuver.stop(time.time())
+                self.position, self.yaw = self.maneuver.end.copy(), self.maneuver.end_yaw
+                self.maneuver = None
+
+    def move(self, end, end_yaw:float, duration:float, time_scale:float) -> MockFuture:
+        self.stop()
+        with self.lock:
+            self.maneuver = MockManeuver(self.position.copy(), np.array(end, dtype=float), self.yaw, end_yaw, duration, time_scale)
+            return MockFuture(self.maneuver)
+
+    def set_pose(self, position, yaw:float):
+        self.stop()
+        with self.lock:
+            self.position = np.array(position, dtype=float)
+            self.yaw = yaw
+
+
+class MockWorld:
+    """Vehicles and segmentation objects of one fake simulator."""
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.lock = threading.Lock()
+        self.vehicles = {}
+        # mesh name -> (position, radius); everything else is sea
+        self.meshes = {
+            cfg.mock.ship_mesh: (np.array(cfg.mock.ship_position, dtype=float), cfg.mock.ship_radius),
+        }
+        self.object_ids = {}
+        self.color_map = load_color_map(cfg.color_file)
+
+        height, width = cfg.mock.image_size
+        # fixed texture so that encoded frames have a realistic size
+        rng = np.random.default_rng(0)
+        self.sea = np.clip(
+            rng.normal(0, 12, size=(height, width, 3)) + np.array([140, 90, 30]), 0, 255
+        ).astype(np.uint8)
+
+    def vehicle(self, vehicle_name:str) -> MockVehicle:
+        with self.lock:
+            if vehicle_name not in self.vehicles:
+                self.vehicles[vehicle_name] = MockVehicle()
+            return self.vehicles[vehicle_name]
+
+    def project(self, camera_name, position:np.ndarray, yaw:float) -> list:
+        """Image circles (u, v, r, object id) of the objects seen by a camera
+        with a 90 degree field of view."""
+        height, width = self.cfg.mock.image_size
+        f = width / 2
+        circles = []
+        for mesh, (center, radius) in self.meshes.items():
+            rel = center - position
+            forward = rel[0] * math.cos(yaw) + rel[1] * math.sin(yaw)
+            right = -rel[0] * math.sin(yaw) + rel[1] * math.cos(yaw)
+            down = rel[2]
+            if str(camera_name) in BOTTOM_CAMERAS:
+                if down <= 1:
+                    continue
+                u, v, r = width / 2 + f * right / down, height / 2 - f * forward / down, f * radius / down
+            else:
+                if forward <= 1:
+                    continue
+                u, v, r = width / 2 + f * right / forward, height / 2 + f * down / forward, f * radius / forward
+            # keep the coordinates in the range cv2 accepts
+            limit = 4 * max(width, height)
+            if abs(u) - r > limit or abs(v) - r > limit:
+                continue
+            circles.append((int(np.clip(u, -limit, limit)), int(np.clip(v, -limit, limit)), int(min(r, limit)), self.object_ids.get(mesh, None)))
+        return circles
+
+    def render(self, request, position:np.ndarray, yaw:float) -> airsim.ImageResponse:
+        height, width = self.cfg.mock.image_size
+        circles = self.project(request.camera_name, position, yaw)
+
+        response = airsim.ImageResponse()
+        response.height = height
+        response.width = width
+        response.image_type = request.image_type
+        response.compress = request.compress
+        response.pixels_as_float = request.pixels_as_float
+        response.camera_position = airsim.Vector3r(*position)
+        response.camera_orientation = airsim.to_quaternion(0, 0, yaw)
+        response.time_stamp = time.time_ns()
+        response.message = ""
+        response.image_data_uint8 = b""
+        response.image_data_float = []
+
+        if request.image_type == airsim.ImageType.Segmentation:
+            img = np.zeros((height, width, 3), dtype=np.uint8)
+            img[:] = self.color_map[0]
+            for u, v, r, object_id in circles:
+                if object_id is not None:
+                    cv2.circle(img, (u, v), r, [int(c) for c in self.color_map[object_id]], -1)
+        elif request.image_type in (airsim.ImageType.DepthPerspective, airsim.ImageType.DepthPlanar):
+            altitude = max(-position[2], 1.0)
+            depth = np.full((height, width), altitude if str(request.camera_name) in BOTTOM_CAMERAS else 1000.0, dtype=np.float32)
+            response.image_data_float = depth.reshape(-1).tolist()
+            return response
+        else:
+            img = self.sea.copy()
+            for u, v, r, _ in circles:
+                cv2.circle(img, (u, v), r, (120, 120, 120), -1)
+
+        if request.compress:
+            response.image_data_uint8 = cv2.imencode(".png", img)[1].tobytes()
+        else:
+            response.image_data_uint8 = img.tobytes()
+        return response
+
+
+class MockMultirotorClient:
+    """Headless stand-in for airsim.MultirotorClient.
+
+    Implements the calls made by AirSimController with linear kinematics
+    played back at cfg.mock.time_scale, synthetic scene/segmentation/depth
+    frames and a configurable latency per call, so the server stack can be
+    load tested without Unreal.
+    """
+    def __init__(self, ip:str="", port:int=41451, timeout_value:int=3600, cfg=None):
+        if cfg is None:
+            from configs import get_default_config
+            cfg = get_default_config()
+        self.cfg = cfg
+        with WORLDS_LOCK:
+            key = (ip, port)
+            if key not in WORLDS:
+                WORLDS[key] = MockWorld(cfg)
+            self.world = WORLDS[key]
+
+    def rpc(self, images:int = 0):
+        time.sleep(self.cfg.mock.rpc_latency + images * self.cfg.mock.image_latency)
+
+    def scaled(self, vehicle_name:str, end, end_yaw:float, duration:float) -> MockFuture:
+        return self.world.vehicle(vehicle_name).move(end, end_yaw, duration, self.cfg.mock.time_scale)
+
+    # connection
+    def confirmConnection(self):
+        self.rpc()
+
+    def enableApiControl(self, is_enabled:bool, vehicle_name:str=""):
+        self.rpc()
+
+    def armDisarm(self, arm:bool, vehicle_name:str="") -> bool:
+        self.rpc()
+        return True
+
+    # motion
+    def takeoffAsync(self, timeout_sec:float=20, vehicle_name:str="") -> MockFuture:
+        self.rpc()
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        return self.scaled(vehicle_name, position + np.array([0, 0, -3.0]), yaw, 3.0)
+
+    def landAsync(self, timeout_sec:float=60, vehicle_name:str="") -> MockFuture:
+        self.rpc()
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        return self.scaled(vehicle_name, np.array([position[0], position[1], 0.0]), yaw, abs(position[2]) / 2.0)
+
+    def hoverAsync(self, vehicle_name:str="") -> MockFuture:
+        self.rpc()
+        self.world.vehicle(vehicle_name).stop()
+        return MockFuture()
+
+    def cancelLastTask(self, vehicle_name:str=""):
+        self.rpc()
+        self.world.vehicle(vehicle_name).stop()
+
+    def moveToPositionAsync(self, x, y, z, velocity, timeout_sec=3e+38, drivetrain=0, yaw_mode=airsim.YawMode(),
+                            lookahead=-1, adaptive_lookahead=1, vehicle_name:str="") -> MockFuture:
+        self.rpc()
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        end = np.array([x, y, z], dtype=float)
+        return self.scaled(vehicle_name, end, yaw, np.linalg.norm(end - position) / max(velocity, 1e-3))
+
+    def moveToZAsync(self, z, velocity, timeout_sec=3e+38, yaw_mode=airsim.YawMode(),
+                     lookahead=-1, adaptive_lookahead=1, vehicle_name:str="") -> MockFuture:
+        self.rpc()
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        return self.scaled(vehicle_name, np.array([position[0], position[1], z]), yaw, abs(z - position[2]) / max(velocity, 1e-3))
+
+    def moveByVelocityAsync(self, vx, vy, vz, duration, drivetrain=0, yaw_mode=airsim.YawMode(), vehicle_name:str="") -> MockFuture:
+        self.rpc()
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        duration = max(duration, 0)
+        end_yaw = yaw + math.radians(yaw_mode.yaw_or_rate) * duration if yaw_mode.is_rate else math.radians(yaw_mode.yaw_or_rate)
+        return self.scaled(vehicle_name, position + np.array([vx, vy, vz]) * duration, end_yaw, duration)
+
+    def moveByVelocityBodyFrameAsync(self, vx, vy, vz, duration, drivetrain=0, yaw_mode=airsim.YawMode(), vehicle_name:str="") -> MockFuture:
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        world_vx = vx * math.cos(yaw) - vy * math.sin(yaw)
+        world_vy = vx * math.sin(yaw) + vy * math.cos(yaw)
+        return self.moveByVelocityAsync(world_vx, world_vy, vz, duration, drivetrain, yaw_mode, vehicle_name)
+
+    # state
+    def simSetVehiclePose(self, pose, ignore_collision:bool, vehicle_name:str=""):
+        self.rpc()
+        position = [pose.position.x_val, pose.position.y_val, pose.position.z_val]
+        yaw = airsim.to_eularian_angles(pose.orientation)[2]
+        self.world.vehicle(vehicle_name).set_pose(position, yaw)
+
+    def simGetVehiclePose(self, vehicle_name:str="") -> airsim.Pose:
+        self.rpc()
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        return airsim.Pose(airsim.Vector3r(*position), airsim.to_quaternion(0, 0, yaw))
+
+    def getMultirotorState(self, vehicle_name:str="") -> airsim.MultirotorState:
+        self.rpc()
+        now = time.time()
+        vehicle = self.world.vehicle(vehicle_name)
+        position, yaw = vehicle.pose(now)
+        velocity, yaw_rate = vehicle.velocity(now)
+
+        kinematics = airsim.KinematicsState()
+        kinematics.position = airsim.Vector3r(*position)
+        kinematics.orientation = airsim.to_quaternion(0, 0, yaw)
+        kinematics.linear_velocity = airsim.Vector3r(*velocity)
+        kinematics.angular_velocity = airsim.Vector3r(0, 0, yaw_rate)
+        state = airsim.MultirotorState()
+        state.kinematics_estimated = kinematics
+        state.timestamp = time.time_ns()
+        return state
+
+    # segmentation and images
+    def simSetSegmentationObjectID(self, mesh_name:str, object_id:int, is_name_regex:bool=False) -> bool:
+        self.rpc()
+        found = False
+        for mesh in self.world.meshes:
+            if (re.fullmatch(mesh_name, mesh) if is_name_regex else mesh == mesh_name):
+                self.world.object_ids[mesh] = object_id
+                found = True
+        return found
+
+    def simGetImages(self, requests:list, vehicle_name:str="", external:bool=False) -> list:
+        self.rpc(images=len(requests))
+        position, yaw = self.world.vehicle(vehicle_name).pose(time.time())
+        return [self.world.render(request, position, yaw) for request in requests]
+
+    def simGetImage(self, camera_name, image_type, vehicle_name:str="", external:bool=False) -> bytes:
+        request = airsim.ImageRequest(camera_name, image_type)
+        return self.simGetImages([request], vehicle_name, external)[0].image_data_uint8
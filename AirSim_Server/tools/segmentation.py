@@ -0,0 +1,118 @@
+import re
+import numpy as np
+
+
+def load_color_map(color_file:str) -> list:
+    # object id -> color, in the channel order of the segmentation buffer
+    color_map = []
+    with open(color_file, "r") as f:
+        lines = f.read()
+        pattern = re.compile(r"\d+\t\[(\d+), (\d+), (\d+)\]")
+        for match in pattern.findall(lines):
+            color = [int(i) for i in match]
+            color_map.append(color[::-1])
+    return color_map
+
+
+def pack_color(color) -> int:
+    # same channel order as the pixels of the segmentation buffer
+    return (int(color[0]) << 16) | (int(color[1]) << 8) | int(color[2])
+
+
+def pack_rgb(data, height:int, width:int) -> np.ndarray:
+    """Pack a 3-channel uint8 image into one uint32 key per pixel.
+
+    The keys are read through a big-endian uint32 view with a 3 byte stride
+    directly over ``data`` (e.g. ``ImageResponse.image_data_uint8``), so the
+    only allocation is the HxW key array itself.
+    """
+    if isinstance(data, np.ndarray):
+        buf = np.ascontiguousarray(data, dtype=np.uint8).reshape(-1)
+    else:
+        buf = np.frombuffer(data, dtype=np.uint8)
+    n = height * width
+    if buf.size < n * 3:
+        raise ValueError(f"Expected {n * 3} bytes for a {height}x{width} image, got {buf.size}")
+
+    keys = np.empty(n, dtype=np.uint32)
+    if n > 1:
+        # every word covers one pixel plus the first byte of the next one
+        words = np.ndarray(shape=(n - 1,), dtype=">u4", buffer=buf, strides=(3,))
+        np.right_shift(words, 8, out=keys[:-1])
+    if n > 0:
+        keys[-1] = pack_color(buf[3 * n - 3:3 * n])
+    return keys.reshape(height, width)
+
+
+def object_mask(keys:np.ndarray, color) -> np.ndarray:
+    return keys == pack_color(color)
+
+
+def object_stats(keys:np.ndarray, color_map:list, object_ids:list, center_size:int=None) -> dict:
+    """Pixel count, coverage, centroid and bounding box of every object id in
+    a single scan.
+
+    ``bbox`` is ``[x_min, y_min, x_max, y_max]`` (inclusive) and ``centroid``
+    is ``[x, y]``; both are None when the object is not visible. With
+    ``center_size`` the pixels inside the centered ``center_size`` square are
+    counted as well.
+    """
+    object_ids = list(object_ids)
+    height, width = keys.shape
+    flat = keys.reshape(-1)
+
+    colors = np.array([pack_color(color_map[i]) for i in object_ids], dtype=np.uint32)
+    order = np.argsort(colors)
+    sorted_colors = colors[order]
+
+    # label every pixel with the index of its object, -1 for the background
+    if len(object_ids) == 1:
+        hit = flat == colors[0]
+        pixels = np.flatnonzero(hit)
+        labels = np.zeros(pixels.size, dtype=np.intp)
+    else:
+        pos = np.searchsorted(sorted_colors, flat)
+        np.minimum(pos, len(sorted_colors) - 1, out=pos)
+        hit = sorted_colors[pos] == flat
+        pixels = np.flatnonzero(hit)
+        labels = order[pos[pixels]]
+
+    counts = np.bincount(labels, minlength=len(object_ids))
+    rows, cols = np.divmod(pixels, width)
+    row_sums = np.bincount(labels, weights=rows, minlength=len(object_ids))
+    col_sums = np.bincount(labels, weights=cols, minlength=len(object_ids))
+
+    x_min = np.full(len(object_ids), width, dtype=np.intp)
+    y_min = np.full(len(object_ids), height, dtype=np.intp)
+    x_max = np.full(len(object_ids), -1, dtype=np.intp)
+    y_max = np.full(len(object_ids), -1, dtype=np.intp)
+    np.minimum.at(x_min, labels, cols)
+    np.minimum.at(y_min, labels, rows)
+    np.maximum.at(x_max, labels, cols)
+    np.maximum.at(y_max, labels, rows)
+
+    if center_size:
+        half = center_size // 2
+        top, bottom = max(height // 2 - half, 0), min(height // 2 + half, height)
+        left, right = max(width // 2 - half, 0), min(width // 2 + half, width)
+        inside = (rows >= top) & (rows < bottom) & (cols >= left) & (cols < right)
+        center_counts = np.bincount(labels[inside], minlength=len(object_ids))
+        center_area = (bottom - top) * (right - left)
+
+    stats = {}
+    for i, object_id in enumerate(object_ids):
+        bbox = None
+        centroid = None
+        if counts[i]:
+            bbox = [int(x_min[i]), int(y_min[i]), int(x_max[i]), int(y_max[i])]
+            centroid = [float(col_sums[i] / counts[i]), float(row_sums[i] / counts[i])]
+        stats[object_id] = {
+            "pixels": int(counts[i]),
+            "coverage": float(counts[i] / (height * width)),
+            "centroid": centroid,
+            "bbox": bbox,
+        }
+        if center_size:
+            stats[object_id]["center_pixels"] = int(center_counts[i])
+            stats[object_id]["center_coverage"] = float(center_counts[i] / center_area)
+    return stats
@@ -0,0 +1,101 @@
+import contextvars
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from tools.tracing import tracer
+
+# timer of the episode running in this context, for stages timed in task code
+CURRENT_TIMER = contextvars.ContextVar("current_timer", default=None)
+
+
+class StageTimer:
+    """Collects the wall time spent in each stage of the task loop, for the
+    current step and accumulated over the episode."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.records = defaultdict(list)
+            self.step = {}
+            # timings of every finished step, for per-step percentiles
+            self.history = []
+
+    def new_step(self) -> dict:
+        # returns the timings of the step that just ended
+        with self.lock:
+            last, self.step = self.step, {}
+            if last:
+                self.history.append(last)
+        return last
+
+    def add(self, name:str, seconds:float):
+        with self.lock:
+            self.records[name].append(seconds)
+            self.step[name] = self.step.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name:str):
+        start = time.perf_counter()
+        try:
+            # every stage is also a span of the current step
+            with tracer.span(name):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                name: {
+                    "count": len(values),
+                    "total": sum(values),
+                    "mean": sum(values) / len(values),
+                }
+                for name, values in self.records.items()
+            }
+
+
+@contextmanager
+def timed_stage(name:str):
+    """Stage of the current episode's step, or only a span outside of episodes."""
+    timer = CURRENT_TIMER.get()
+    if timer is None:
+        with tracer.span(name):
+            yield
+    else:
+        with timer.stage(name):
+            yield
+
+
+def percentile(values:list, q:float) -> float:
+    # linear interpolation between the closest ranks, q in [0, 100]
+    values = sorted(values)
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class TimedAgent:
+    """Wraps an agent so that the model call is recorded as its own stage."""
+    def __init__(self, agent, timer:StageTimer, name:str="inference"):
+        self.agent = agent
+        self.timer = timer
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        with self.timer.stage(self.name):
+            return self.agent(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
+
+
+def format_timings(timings:dict) -> str:
+    return ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
@@ -0,0 +1,155 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+# attributes copied from a span to its children, so every span of a step can
+# be found by episode and step without joining on the parent ids
+CORRELATED = ("episode_id", "step")
+
+# (trace_id, span_id, correlated attributes) of the innermost open span
+CURRENT_SPAN = contextvars.ContextVar("current_span", default=None)
+
+
+class JsonlExporter:
+    """Appends finished spans to a local file, one JSON object per line."""
+    def __init__(self, path:str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def export(self, span:dict):
+        line = json.dumps(span, ensure_ascii=False, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class Tracer:
+    """Minimal span tracer with OpenTelemetry field names.
+
+    Spans nest through a context variable, which asyncio.to_thread and the
+    action executors carry over to their worker threads, and cross the HTTP
+    transport in a W3C ``traceparent`` header. Disabled, ``span`` costs a
+    single check.
+    """
+    def __init__(self, enabled:bool=False, path:str="logs/traces.jsonl", service:str="bedi"):
+        self.lock = threading.Lock()
+        self.exporter = None
+        self.configure(enabled, path, service)
+
+    def configure(self, enabled:bool=False, path:str="logs/traces.jsonl", service:str="bedi"):
+        with self.lock:
+            self.enabled = enabled
+            self.service = service
+            if self.exporter is not None and (not enabled or self.exporter.path != path):
+                self.exporter.close()
+                self.exporter = None
+            if enabled and self.exporter is None:
+                self.exporter = JsonlExporter(path)
+
+    @contextmanager
+    def span(self, name:str, parent:tuple=None, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = parent or CURRENT_SPAN.get()
+        if parent is None:
+            trace_id, parent_id, inherited = secrets.token_hex(16), None, {}
+        else:
+            trace_id, parent_id, inherited = parent
+        span_id = secrets.token_hex(8)
+        attributes = {**inherited, **attributes}
+
+        token = CURRENT_SPAN.set((trace_id, span_id, {
+            key: attributes[key] for key in CORRELATED if key in attributes
+        }))
+        start = time.time_ns()
+        status = {"code": "OK"}
+        try:
+            yield attributes
+        except BaseException as e:
+            status = {"code": "ERROR", "message": repr(e)}
+            raise
+        finally:
+            end = time.time_ns()
+            CURRENT_SPAN.reset(token)
+            self.export(name, trace_id, span_id, parent_id, start, end, attributes, status)
+
+    def record(self, name:str, start:float, end:float=None, **attributes):
+        """Span of work timed elsewhere with time.perf_counter, e.g. an action
+        that ran in the background while the step went on."""
+        if not self.enabled:
+            return
+        now, now_ns = time.perf_counter(), time.time_ns()
+        end = now if end is None else end
+        parent = CURRENT_SPAN.get()
+        trace_id, parent_id, inherited = parent if parent else (secrets.token_hex(16), None, {})
+        self.export(
+            name, trace_id, secrets.token_hex(8), parent_id,
+            now_ns - int((now - start) * 1e9), now_ns - int((now - end) * 1e9),
+            {**inherited, **attributes}, {"code": "OK"}
+        )
+
+    def export(self, name, trace_id, span_id, parent_id, start, end, attributes, status):
+        exporter = self.exporter
+        if exporter is None:
+            return
+        exporter.export({
+            "name": name,
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_span_id": parent_id,
+            "start_time_unix_nano": start,
+            "end_time_unix_nano": end,
+            "duration_ms": (end - start) / 1e6,
+            "attributes": attributes,
+            "status": status,
+            "resource": {"service.name": self.service, "process.pid": os.getpid()},
+        })
+
+    def inject(self) -> dict:
+        # headers continuing the current span in another process
+        parent = CURRENT_SPAN.get()
+        if not self.enabled or parent is None:
+            return {}
+        trace_id, span_id, inherited = parent
+        headers = {"traceparent": f"00-{trace_id}-{span_id}-01"}
+        if inherited:
+            headers["baggage"] = ",".join(f"{key}={value}" for key, value in inherited.items())
+        return headers
+
+    def extract(self, headers) -> tuple:
+        traceparent = headers.get("traceparent", None)
+        if not traceparent:
+            return None
+        try:
+            _, trace_id, span_id, _ = traceparent.split("-")
+        except ValueError:
+            return None
+        inherited = {}
+        for item in headers.get("baggage", "").split(","):
+            key, _, value = item.partition("=")
+            if key in CORRELATED:
+                inherited[key] = int(value) if value.isdigit() else value
+        return trace_id, span_id, inherited
+
+
+tracer = Tracer()
+
+
+def configure_tracing(cfg):
+    tracer.configure(
+        enabled=cfg.tracing.enabled,
+        path=cfg.tracing.path,
+    )
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import requests
+from concurrent.futures import CancelledError
+
+from tools.tracing import tracer
+
+
+class HttpTransport:
+    """Send actions to an AirSim control server over HTTP (remote deployments)."""
+    def __init__(self,
+                 logger: logging.Logger,
+                 url: str,
+                 timeout: float = None,
+                 vehicle_name: str = ""):
+        self.logger = logger
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        # the control server routes the actions to this vehicle
+        self.vehicle_name = vehicle_name
+        # keep the TCP connection alive between steps
+        self.session = requests.Session()
+
+    def __call__(self, payload: dict) -> dict:
+        response = self.session.post(
+            f"{self.url}/control",
+            json=self.route(payload),
+            headers=tracer.inject(),
+            timeout=self.timeout
+        )
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            self.logger.error(f"Failed to control AirSim: {response.status_code}")
+            raise Exception(
+                f"Failed to control AirSim: {response.status_code}"
+            )
+
+    def batch(self, payloads: list) -> list:
+        response = self.session.post(
+            f"{self.url}/control/batch",
+            json={"actions": [self.route(payload) for payload in payloads]},
+            headers=tracer.inject(),
+            timeout=self.timeout
+        )
+
+        if response.status_code == 200:
+            return response.json()["results"]
+        else:
+            self.logger.error(f"Failed to control AirSim: {response.status_code}")
+            raise Exception(
+                f"Failed to control AirSim: {response.status_code}"
+            )
+
+    def submit(self, payload: dict):
+        return RemoteActionHandle(self, self.request("POST", "/actions", json=self.route(payload)))
+
+    def route(self, payload: dict) -> dict:
+        if not self.vehicle_name:
+            return payload
+        return {**payload, "vehicle_name": self.vehicle_name}
+
+    def request(self, method: str, path: str, **kwargs) -> dict:
+        response = self.session.request(method, f"{self.url}{path}", headers=tracer.inject(), timeout=self.timeout, **kwargs)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            self.logger.error(f"Failed to control AirSim: {response.status_code}")
+            raise Exception(
+                f"Failed to control AirSim: {response.status_code}"
+            )
+
+
+class RemoteActionHandle:
+    """Counterpart of ActionHandle for actions submitted over HTTP."""
+    def __init__(self, transport: HttpTransport, info: dict):
+        self.transport = transport
+        self.action_id = info["action_id"]
+        self.info = info
+
+    @property
+    def status(self) -> str:
+        return self.info["status"]
+
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def refresh(self, wait: float = 0) -> dict:
+        self.info = self.transport.request("GET", f"/actions/{self.action_id}", params={"wait": wait})
+        return self.info
+
+    def wait(self, timeout: float = None) -> bool:
+        if not self.done():
+            # long poll the server, in slices when waiting without timeout
+            while True:
+                self.refresh(wait=timeout if timeout is not None else 5)
+                if self.done() or timeout is not None:
+                    break
+        return self.done()
+
+    def result(self, timeout: float = None) -> dict:
+        if not self.wait(timeout):
+            raise TimeoutError(f"Action {self.action_id} is still {self.status}")
+        if self.status == "cancelled":
+            raise CancelledError()
+        if self.status == "failed":
+            raise Exception(self.info["error"])
+        return self.info["result"]
+
+    def cancel(self) -> bool:
+        self.info = self.transport.request("DELETE", f"/actions/{self.action_id}")
+        return self.status != "done"
+
+    def __await__(self):
+        return asyncio.to_thread(self.result).__await__()
+
+
+class LocalTransport:
+    """Call an in-process AirSimController directly, skipping the HTTP hop."""
+    def __init__(self,
+                 logger: logging.Logger,
+                 controller):
+        self.logger = logger
+        self.controller = controller
+
+    def __call__(self, payload: dict) -> dict:
+        # same reply shape as the /control route
+        result = self.controller.exec_action(payload)
+        if result:
+            return result
+        return {"status": "success"}
+
+    def batch(self, payloads: list) -> list:
+        return self.controller.exec_batch(payloads)
+
+    def submit(self, payload: dict):
+        return self.controller.actions.submit(payload)
+
+
+def build_transport(cfg, logger: logging.Logger, controller=None, index: int = 0, vehicle_name: str = ""):
+    if cfg.server.transport == "local":
+        if controller is None:
+            raise ValueError("Local transport requires an in-process AirSimController.")
+        return LocalTransport(logger, controller)
+    elif cfg.server.transport == "http":
+        return HttpTransport(
+            logger,
+            # the control server of the i-th simulator listens on airsim_port + i
+            f"http://{cfg.server.airsim_host}:{cfg.server.airsim_port + index}",
+            timeout=cfg.server.timeout,
+            vehicle_name=vehicle_name
+        )
+    else:
+        raise NotImplementedError(
+            f"Transport {cfg.server.transport} is not supported yet."
+        )
@@ -4,50 +4,209 @@ import numpy as np
 import ast
 from PIL import Image, ImageDraw
 import os
+import io
+from mimetypes import guess_type
+
+from tools.frame_store import frame_store
+from tools.timing import timed_stage
 
 CACHE_DIR = "cache/modified_images"
 
 def extract_json(text:str):
-    # print(text)
-
-    json_data=None
-    if "json" in text:
-        json_data=re.compile(r"```json\n(.*?)\n```", re.DOTALL).findall(text)
-        json_data=json_data[0]
-    elif "{" in text:
-        json_data=re.search(r'\{.*\}', text, re.DOTALL)
-        json_data=json_data.group(0)
-    else:
-        json_data=text
-
-    if json_data:
-        try:
-            json_data=json.loads(json_data)
-            return json_data
-        except json.JSONDecodeError:
-            json_data=ast.literal_eval(json_data)
-            return json_data
-        except:
+    with timed_stage("parse"):
+        # print(text)
+
+        json_data=None
+        if "json" in text:
+            json_data=re.compile(r"```json\n(.*?)\n```", re.DOTALL).findall(text)
+            json_data=json_data[0]
+        elif "{" in text:
+            json_data=re.search(r'\{.*\}', text, re.DOTALL)
+            json_data=json_data.group(0)
+        else:
+            json_data=text
+
+        if json_data:
+            try:
+                json_data=json.loads(json_data)
+                return json_data
+            except json.JSONDecodeError:
+                json_data=ast.literal_eval(json_data)
+                return json_data
+            except:
+                raise ValueError("Failed to extract json data from text")
+        else:
             raise ValueError("Failed to extract json data from text")
-    else:
-        raise ValueError("Failed to extract json data from text")
 
 def draw_box(image:str,
              height:int=80,
-             width:int=80):
+             width:int=80,
+             line_width:int=5,
+             max_side:int=None):
     
 
-    os.makedirs(CACHE_DIR, exist_ok=True)
-
-    src_image=Image.open(image)
+    src_image=Image.open(io.BytesIO(frame_store.read(image)))
+    image_format=src_image.format
     w,h=src_image.size
 
+    # the frame is downscaled to max_side before it reaches the model,
+    # thicken the outline so that it is still line_width pixels wide there
+    if max_side and max(w,h) > max_side:
+        line_width = round(line_width * max(w,h) / max_side)
+
     draw = ImageDraw.Draw(src_image)
 
     box = [(w-width)//2, (h-height)//2, (w+width)//2, (h+height)//2]
-    draw.rectangle(box, outline="red", width=5)
+    draw.rectangle(box, outline="red", width=line_width)
 
     basename = os.path.basename(image)
     modified_image = os.path.join(CACHE_DIR, basename.split(".")[0] + "_modified." + basename.split(".")[1])
-    src_image.save(modified_image)
-    return modified_image
\ No newline at end of file
+    buf = io.BytesIO()
+    src_image.save(buf, format=image_format)
+    return frame_store.put(modified_image, buf.getvalue())
+
+def image_mime(image:str, policy:tuple=None) -> str:
+    # mime type of the payload sent to the model for this frame
+    if policy and policy[1]:
+        return guess_type(f"image.{policy[1]}")[0]
+    return guess_type(image)[0]
+
+def encode_for_model(data:bytes, max_side:int=0, fmt:str="", quality:int=90) -> bytes:
+    """Downscale a frame so that its longer side is at most max_side and
+    re-encode it as fmt (png/jpg/webp); unchanged when neither applies."""
+    src_image=Image.open(io.BytesIO(data))
+    w,h=src_image.size
+    if not fmt and not (max_side and max(w,h) > max_side):
+        return data
+
+    if max_side and max(w,h) > max_side:
+        scale = max_side / max(w,h)
+        src_image = src_image.resize((max(round(w*scale),1), max(round(h*scale),1)), Image.LANCZOS)
+
+    fmt = (fmt or src_image.format).lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt == "jpeg" and src_image.mode != "RGB":
+        src_image = src_image.convert("RGB")
+    buf = io.BytesIO()
+    src_image.save(buf, format=fmt, quality=quality)
+    return buf.getvalue()
+
+class JsonStreamParser:
+    """Incremental parser for the JSON object of a streamed model response.
+
+    Feed the text chunk by chunk; every top-level field is added to
+    ``fields`` as soon as its value is closed, so that e.g. the action can
+    be dispatched while the model is still writing its analysis.
+    """
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self.done = False
+
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        # what is expected next inside the top-level object
+        self.state = "key"
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+
+    def feed(self, chunk:str) -> dict:
+        """Returns the fields completed by this chunk."""
+        self.text += chunk
+        completed = {}
+        text = self.text
+        while self.pos < len(text) and not self.done:
+            i, c = self.pos, text[self.pos]
+            self.pos += 1
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == "key":
+                        self.key = json.loads(text[self.key_start:i + 1])
+                        self.state = "colon"
+                    elif self.depth == 1 and self.state == "value":
+                        self._commit(text[self.value_start:i + 1], completed)
+                continue
+
+            if self.depth == 0:
+                # skip code fences and any text before the object
+                if c == "{":
+                    self.depth = 1
+                    self.state = "key"
+                continue
+
+            if c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.state == "key":
+                    self.key_start = i
+                elif self.depth == 1 and self.state == "value" and self.value_start is None:
+                    self.value_start = i
+            elif c in "{[":
+                if self.depth == 1 and self.state == "value" and self.value_start is None:
+                    self.value_start = i
+                self.depth += 1
+            elif c in "}]":
+                if self.depth == 1:
+                    # a number, bool or null right before the closing brace
+                    if self.state == "value" and self.value_start is not None:
+                        self._commit(text[self.value_start:i], completed)
+                    self.depth = 0
+                    self.done = True
+                else:
+                    self.depth -= 1
+                    if self.depth == 1 and self.state == "value":
+                        self._commit(text[self.value_start:i + 1], completed)
+            elif self.depth == 1:
+                if c == ":" and self.state == "colon":
+                    self.state = "value"
+                    self.value_start = None
+                elif c == ",":
+                    if self.state == "value" and self.value_start is not None:
+                        self._commit(text[self.value_start:i], completed)
+                    self.state = "key"
+                elif not c.isspace() and self.state == "value" and self.value_start is None:
+                    self.value_start = i
+        return completed
+
+    def _commit(self, raw:str, completed:dict):
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                value = ast.literal_eval(raw.strip())
+            except (ValueError, SyntaxError):
+                # left to extract_json once the response is complete
+                value = None
+        if value is not None or raw.strip() == "null":
+            self.fields[self.key] = value
+            completed[self.key] = value
+        self.state = "after"
+
+    def partial(self, key:str) -> str:
+        """The text of a string field so far, also while it is still streaming."""
+        if key in self.fields:
+            value = self.fields[key]
+            return value if isinstance(value, str) else None
+        if self.key != key or not self.in_string or self.depth != 1 or self.state != "value":
+            return None
+        raw = self.text[self.value_start + 1:]
+        # drop a trailing escape sequence that is not complete yet
+        for cut in range(min(len(raw), 6) + 1):
+            try:
+                return json.loads(f'"{raw[:len(raw) - cut]}"')
+            except json.JSONDecodeError:
+                continue
+        return None
+
+    def result(self) -> dict:
+        if self.done and self.fields:
+            return dict(self.fields)
+        return extract_json(self.text)
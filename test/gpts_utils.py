@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "AirSim_Server"))
+from tools.response_cache import ResponseCache
+
+
+def build_session(pool_size:int=10) -> requests.Session:
+    # keep-alive connections reused across the requests of a script
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def post_with_retries(session:requests.Session, url:str, payload:dict, headers:dict,
+                      timeout:float=60, max_retries:int=5, sleep_time:float=2) -> requests.Response:
+    retries = 0
+    while retries<max_retries:
+        try:
+            response = session.post(url,json=payload,headers=headers,timeout=timeout)
+            if response.status_code == 200:
+                return response
+        except requests.RequestException:
+            # timeouts and dropped connections count as a failed attempt
+            pass
+        retries+=1
+        time.sleep(sleep_time)
+
+    raise Exception("Max retries reached.")
+
+
+def open_cache(cache_path:str):
+    # answers of identical requests are reused across reruns; cache_path=None disables it
+    return ResponseCache(cache_path) if cache_path else None
+
+
+def cached_completion(cache, model_name:str, url:str, payload:dict, fetch, bypass:bool=False) -> str:
+    """Answer to ``payload`` from ``cache``, or from ``fetch()`` when missing
+    or ``bypass`` is set; fresh answers are stored either way."""
+    if cache is None:
+        return fetch()
+    # the payload holds the model, sampling params, history and encoded images
+    key = cache.make_key(url=url, payload=payload)
+    output = None if bypass else cache.get(key)
+    if output is None:
+        output = fetch()
+        cache.put(key, model_name, output)
+    return output
@@ -7,6 +7,7 @@ from zoneinfo import ZoneInfo
 import ast
 import json
 import os
+import sys
 import base64
 import time
 
@@ -16,6 +17,9 @@ from mimetypes import guess_type
 
 from tqdm import tqdm
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gpts_utils import build_session, post_with_retries, open_cache, cached_completion
+
 os.environ['OPENAI_API_KEY'] = "XXXXXX" # replace with your API key
 
 class GPTS:
@@ -24,7 +28,11 @@ class GPTS:
                  model_name:str="gpt-4o",
                  temperature:float=0.5,
                  top_p:float=1.0,
-                 max_tokens:int=2000):
+                 max_tokens:int=2000,
+                 timeout:float=60,
+                 pool_size:int=10,
+                 cache_path:str="cache/responses.sqlite3",
+                 bypass_cache:bool=False):
         
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         
@@ -50,6 +58,12 @@ class GPTS:
         self.default_prompt = "You are a useful assistant who can efficiently complete user-specified tasks or answer user questions well."
         self.default_sleep_time = 2
         self.max_retries = 5
+        self.timeout = timeout
+
+        self.session = build_session(pool_size)
+
+        self.cache = open_cache(cache_path)
+        self.bypass_cache = bypass_cache
 
         # self.url="https://reverse.onechat.fun/v1/chat/completions"
         self.url="https://chatapi.onechats.top/v1/chat/completions"
@@ -119,19 +133,14 @@ class GPTS:
                     }
                 )
 
-        retries = 0
-        while retries<self.max_retries:
-            response = requests.post(self.url,json=payload,headers=self.get_headers())
-            if response.status_code == 200:
-                break
-            else:
-                retries+=1
-                time.sleep(self.default_sleep_time)
-
-        if retries==self.max_retries:
-            raise Exception("Max retries reached.")
-        
-        output = self.parse_response(response)
+        output = cached_completion(
+            self.cache, self.model_name, self.url, payload,
+            lambda: self.parse_response(post_with_retries(
+                self.session, self.url, payload, self.get_headers(),
+                self.timeout, self.max_retries, self.default_sleep_time
+            )),
+            self.bypass_cache
+        )
         payload["messages"].append(
             {
                 "role":"assistant",